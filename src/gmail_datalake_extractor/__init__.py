@@ -4,6 +4,7 @@ from gmail_datalake_extractor.api import app
 from gmail_datalake_extractor.auth import get_credentials, get_service
 from gmail_datalake_extractor.messages import (
     fetch_messages_with_retry,
+    fetch_messages_with_retry_async,
     get_message_list,
 )
 from gmail_datalake_extractor.models import FetchConfig, ListMessagesResponse, Message
@@ -14,6 +15,7 @@ __all__ = [
     "get_service",
     "get_message_list",
     "fetch_messages_with_retry",
+    "fetch_messages_with_retry_async",
     "FetchConfig",
     "Message",
     "ListMessagesResponse",
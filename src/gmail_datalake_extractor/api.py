@@ -1,18 +1,40 @@
 """FastAPI endpoints for message extraction."""
 
+import asyncio
 import logging
 import traceback
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime
 from uuid import uuid4
 
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi import (
+    BackgroundTasks,
+    FastAPI,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from gmail_datalake_extractor.extract.extract import get_messages, save_to_datalake
+from gmail_datalake_extractor.auth import get_service
+from gmail_datalake_extractor.config import config
+from gmail_datalake_extractor.extract.extract import (
+    close_datalake_connection,
+    iter_messages,
+    list_message_ids,
+    save_to_datalake,
+)
 from gmail_datalake_extractor.models import FetchConfig
 from gmail_datalake_extractor.task_storage import (
+    TERMINAL_TASK_STATUSES,
     cleanup_old_tasks,
+    close_task_db,
     create_task,
+    create_tasks,
+    fail_interrupted_tasks,
+    flush_task_updates,
     get_task,
     update_task,
 )
@@ -28,10 +50,52 @@ logging.basicConfig(
 logger = logging.getLogger("gmail_datalake_extractor.api")
 
 
+async def sweep_old_tasks() -> None:
+    """Periodically remove expired tasks and enforce the task store size limit."""
+    while True:
+        try:
+            await asyncio.to_thread(cleanup_old_tasks)
+        except Exception as e:
+            logger.error(f"Task cleanup failed: {e}")
+        await asyncio.sleep(config.task.cleanup_interval)
+
+
+async def flush_task_updates_periodically() -> None:
+    """Periodically write coalesced task progress updates to the task store."""
+    while True:
+        await asyncio.sleep(config.task.flush_interval)
+        try:
+            await asyncio.to_thread(flush_task_updates)
+        except Exception as e:
+            logger.error(f"Task update flush failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Recover task state on startup and release shared resources on shutdown."""
+    fail_interrupted_tasks()
+    # Limits how many extractions share the process at once; the rest wait
+    # queued. Created here so it belongs to the event loop serving the app.
+    app.state.extraction_slots = asyncio.Semaphore(config.task.max_concurrent)
+    background_jobs = [
+        asyncio.create_task(sweep_old_tasks()),
+        asyncio.create_task(flush_task_updates_periodically()),
+    ]
+    yield
+    for job in background_jobs:
+        job.cancel()
+    await asyncio.gather(*background_jobs, return_exceptions=True)
+    flush_task_updates()
+    close_datalake_connection()
+    close_task_db()
+
+
 app = FastAPI(
     title="Gmail DataLake Extractor API",
     description="Gmail message extraction service with DuckLake storage",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -46,6 +110,14 @@ class ExtractRequest(BaseModel):
     fetch_config: FetchConfig = Field(description="Configuration for message fetching")
 
 
+class ExtractBatchRequest(BaseModel):
+    """Request model for starting several extractions at once."""
+
+    requests: list[ExtractRequest] = Field(
+        description="Extractions to start", min_length=1, max_length=100
+    )
+
+
 class ExtractResponse(BaseModel):
     """Response model for message extraction."""
 
@@ -76,7 +148,13 @@ class TaskStatusResponse(BaseModel):
 
 
 async def run_extraction_task(task_id: str, request: ExtractRequest) -> None:
-    """Run the extraction task in the background."""
+    """Run the extraction task in the background once an extraction slot is free."""
+    async with app.state.extraction_slots:
+        await _run_extraction(task_id, request)
+
+
+async def _run_extraction(task_id: str, request: ExtractRequest) -> None:
+    """Fetch messages for a task and save them to the datalake."""
     try:
         logger.info(f"Starting extraction task {task_id}")
         update_task(
@@ -86,29 +164,43 @@ async def run_extraction_task(task_id: str, request: ExtractRequest) -> None:
             message="Fetching messages from Gmail API...",
         )
 
-        # Fetch messages
-        messages = get_messages(
-            search_query=request.query,
-            max_results=request.max_results,
-            fetch_config=request.fetch_config,
+        # List messages to get IDs
+        service = await asyncio.to_thread(get_service)
+        message_ids = await list_message_ids(
+            service, search_query=request.query, max_results=request.max_results
         )
 
         update_task(
             task_id=task_id,
             status="running",
-            progress=50,
-            message=f"Retrieved {len(messages)} messages, saving to datalake...",
+            progress=10,
+            message=f"Found {len(message_ids)} messages, fetching and saving to datalake...",
         )
 
-        # Save to datalake
-        save_to_datalake(messages)
-
-        update_task(
+        # Fetch messages and save them to the datalake chunk by chunk
+        message_count = 0
+        async for messages in iter_messages(
+            service,
+            message_ids,
+            fetch_config=request.fetch_config,
+            chunk_size=config.database.ingest_batch_size,
+        ):
+            await asyncio.to_thread(save_to_datalake, messages)
+            message_count += len(messages)
+            update_task(
+                task_id=task_id,
+                status="running",
+                progress=10 + 89 * message_count // len(message_ids),
+                message=f"Saved {message_count} of {len(message_ids)} messages to datalake...",
+            )
+
+        await asyncio.to_thread(
+            update_task,
             task_id=task_id,
             status="completed",
             progress=100,
-            message=f"Successfully processed {len(messages)} messages",
-            message_count=len(messages),
+            message=f"Successfully processed {message_count} messages",
+            message_count=message_count,
             completed_at=datetime.now(),
         )
 
@@ -117,7 +209,8 @@ async def run_extraction_task(task_id: str, request: ExtractRequest) -> None:
     except Exception as e:
         logger.error(f"Task {task_id} failed: {e}")
         logger.error(f"Full traceback: {traceback.format_exc()}")
-        update_task(
+        await asyncio.to_thread(
+            update_task,
             task_id=task_id,
             status="failed",
             progress=0,
@@ -139,9 +232,6 @@ async def extract_messages(
     Returns:
         TaskStartResponse with task ID and status
     """
-    # Clean up old tasks before creating a new one
-    background_tasks.add_task(cleanup_old_tasks)
-
     # Generate unique task ID
     task_id = str(uuid4())
 
@@ -165,6 +255,53 @@ async def extract_messages(
     )
 
 
+async def run_extraction_tasks(
+    tasks: list[tuple[str, ExtractRequest]],
+) -> None:
+    """Run several extraction tasks, as many at once as extraction slots allow."""
+    await asyncio.gather(
+        *(run_extraction_task(task_id, request) for task_id, request in tasks)
+    )
+
+
+@app.post("/extract/batch", response_model=list[TaskStartResponse])
+async def extract_messages_batch(
+    batch: ExtractBatchRequest, background_tasks: BackgroundTasks
+) -> list[TaskStartResponse]:
+    """Start one background extraction task per request in the batch.
+
+    All tasks are recorded in a single database transaction and share one
+    background job, which runs them concurrently within the extraction slots.
+
+    Args:
+        batch: ExtractBatchRequest holding the extraction requests
+        background_tasks: FastAPI background tasks
+
+    Returns:
+        TaskStartResponse for each request, in request order
+    """
+    tasks = [(str(uuid4()), request) for request in batch.requests]
+    create_tasks(
+        task_ids=[task_id for task_id, _ in tasks],
+        status="started",
+        progress=0,
+        message="Task started",
+    )
+
+    background_tasks.add_task(run_extraction_tasks, tasks)
+
+    logger.info(f"Started {len(tasks)} extraction tasks")
+
+    return [
+        TaskStartResponse(
+            task_id=task_id,
+            status="started",
+            message="Extraction task started successfully",
+        )
+        for task_id, _ in tasks
+    ]
+
+
 @app.get("/extract/{task_id}/status", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str) -> TaskStatusResponse:
     """Get the status of an extraction task.
@@ -185,6 +322,83 @@ async def get_task_status(task_id: str) -> TaskStatusResponse:
     return TaskStatusResponse(**status)
 
 
+async def watch_task_status(
+    task_id: str,
+) -> AsyncIterator[TaskStatusResponse | None]:
+    """Yield a task's status whenever it changes, until the task finishes.
+
+    Yields None and stops if the task does not exist (or no longer exists).
+    """
+    last_status = None
+    while True:
+        status = await asyncio.to_thread(get_task, task_id)
+        if not status:
+            yield None
+            return
+
+        if status != last_status:
+            yield TaskStatusResponse(**status)
+            last_status = status
+
+        if status["status"] in TERMINAL_TASK_STATUSES:
+            return
+
+        await asyncio.sleep(config.task.status_poll_interval)
+
+
+@app.get("/extract/{task_id}/stream")
+async def stream_task_status_lines(task_id: str) -> StreamingResponse:
+    """Stream status updates of an extraction task as newline-delimited JSON.
+
+    One line (same shape as the status endpoint response) is sent whenever
+    the task changes, and the response ends once the task has completed or
+    failed. This lets plain HTTP clients follow progress without polling.
+
+    Args:
+        task_id: The task ID returned from the extract endpoint
+
+    Raises:
+        HTTPException: If task not found
+    """
+    if not await asyncio.to_thread(get_task, task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def status_lines() -> AsyncIterator[str]:
+        async for status in watch_task_status(task_id):
+            if status is None:
+                return
+            yield status.model_dump_json() + "\n"
+
+    return StreamingResponse(status_lines(), media_type="application/x-ndjson")
+
+
+@app.websocket("/extract/{task_id}/ws")
+async def stream_task_status(websocket: WebSocket, task_id: str) -> None:
+    """Stream status updates of an extraction task over a WebSocket.
+
+    A status frame (same shape as the status endpoint response) is pushed
+    whenever the task changes. The socket is closed once the task has
+    completed or failed, or with code 4404 if the task does not exist.
+
+    Args:
+        websocket: The client WebSocket connection
+        task_id: The task ID returned from the extract endpoint
+    """
+    await websocket.accept()
+
+    try:
+        async for status in watch_task_status(task_id):
+            if status is None:
+                await websocket.close(code=4404, reason="Task not found")
+                return
+            await websocket.send_text(status.model_dump_json())
+    except WebSocketDisconnect:
+        logger.info(f"Client disconnected from task {task_id} status stream")
+        return
+
+    await websocket.close()
+
+
 @app.get("/health")
 async def health_check() -> dict[str, str]:
     """Health check endpoint."""
@@ -1,12 +1,61 @@
 """Gmail API authentication utilities."""
 
-from google.auth.exceptions import RefreshError
+import errno
+import logging
+import os
+import tempfile
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import orjson
+from google.auth.exceptions import RefreshError, TransportError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest, build_http
+from googleapiclient.model import JsonModel
 
 from gmail_datalake_extractor.config import config
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# Refresh the access token in the background once it expires within this margin
+BACKGROUND_REFRESH_MARGIN = timedelta(minutes=5)
+
+_credentials_cache: tuple[Credentials, Path, int] | None = None
+_credentials_lock = threading.Lock()
+
+_service_cache: tuple[Any, Credentials] | None = None
+_service_lock = threading.Lock()
+_thread_local = threading.local()
+
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="token-refresh"
+)
+_refresh_future: Future[None] | None = None
+
+
+class OrjsonModel(JsonModel):
+    """JsonModel that decodes API responses with orjson instead of json."""
+
+    def deserialize(self, content: bytes | str) -> Any:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Like JsonModel, hand back non-JSON bodies as text
+            return content.decode("utf-8") if isinstance(content, bytes) else content
+
 
 class AuthenticationError(Exception):
     """Raised when Gmail API authentication fails."""
@@ -19,6 +68,11 @@ class AuthenticationError(Exception):
 def get_credentials() -> Credentials:
     """Get Gmail API credentials, refreshing if necessary.
 
+    Parsed credentials are cached and reused until they expire or the token
+    file's modification time changes (e.g. after re-running gmail-auth).
+    Credentials that are still valid but expire within five minutes are
+    refreshed on a background thread; expired ones are refreshed inline.
+
     Returns:
         Credentials: Valid Gmail API credentials
 
@@ -26,58 +80,247 @@ def get_credentials() -> Credentials:
         FileNotFoundError: If token file doesn't exist
         ValueError: If token is missing from credentials
         AuthenticationError: For authentication errors with helpful guidance
+        TransportError: If the token endpoint can't be reached to refresh
     """
-    try:
-        if not config.gmail_api.token_path.exists():
-            raise FileNotFoundError(
-                f"Token file not found at {config.gmail_api.token_path}"
-            )
-        creds = Credentials.from_authorized_user_file(
-            str(config.gmail_api.token_path), config.gmail_api.scopes
-        )
-        if not creds.token:
-            raise ValueError("Token not found in credentials")
+    global _credentials_cache
 
-        # Try to refresh if expired or if refresh is needed
-        if creds.expired or not creds.valid:
+    token_path = config.gmail_api.token_path
+    with _credentials_lock:
+        try:
             try:
-                creds.refresh(Request())
-                # Save refreshed token
-                with config.gmail_api.token_path.open("w") as token:
-                    token.write(creds.to_json())
-            except RefreshError as e:
-                error_msg = (
-                    "Refresh token is invalid or expired. Re-authentication required.\n\n"
-                    "This typically happens when:\n"
-                    "  - The refresh token hasn't been used for 6+ months\n"
-                    "  - The token was revoked in your Google Account settings\n"
-                    "  - The OAuth client credentials changed\n\n"
-                    "To fix this:\n"
-                    "  1. Run: uv run gmail-auth\n"
-                    "  2. If running in Docker, run the command on the host machine\n"
-                    "  3. Ensure the new token.json is mounted/available at the configured path\n\n"
-                    f"Token path: {config.gmail_api.token_path}"
-                )
-                raise AuthenticationError(error_msg, original_error=e) from e
+                mtime_ns = token_path.stat().st_mtime_ns
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    f"Token file not found at {token_path}"
+                ) from None
+
+            # Reuse the parsed credentials while the token file is unchanged
+            if _credentials_cache is not None:
+                cached_creds, cached_path, cached_mtime_ns = _credentials_cache
+                if (
+                    cached_path == token_path
+                    and cached_mtime_ns == mtime_ns
+                    and cached_creds.valid
+                ):
+                    _schedule_refresh_if_expiring(cached_creds, token_path)
+                    return cached_creds
+
+            creds = Credentials.from_authorized_user_file(
+                str(token_path), config.gmail_api.scopes
+            )
+            if not creds.token:
+                raise ValueError("Token not found in credentials")
+
+            # Try to refresh if expired or if refresh is needed
+            if creds.expired or not creds.valid:
+                try:
+                    creds.refresh(Request())
+                    mtime_ns = _save_token(creds, token_path)
+                except RefreshError as e:
+                    error_msg = (
+                        "Refresh token is invalid or expired. Re-authentication required.\n\n"
+                        "This typically happens when:\n"
+                        "  - The refresh token hasn't been used for 6+ months\n"
+                        "  - The token was revoked in your Google Account settings\n"
+                        "  - The OAuth client credentials changed\n\n"
+                        "To fix this:\n"
+                        "  1. Run: uv run gmail-auth\n"
+                        "  2. If running in Docker, run the command on the host machine\n"
+                        "  3. Ensure the new token.json is mounted/available at the configured path\n\n"
+                        f"Token path: {token_path}"
+                    )
+                    raise AuthenticationError(error_msg, original_error=e) from e
+        except (FileNotFoundError, ValueError, AuthenticationError, TransportError):
+            # Network failures are transient, so don't report them as auth errors
+            raise
+        except Exception as e:
+            raise AuthenticationError(
+                f"Unexpected error getting credentials: {e}",
+                original_error=e,
+            ) from e
+
+        _credentials_cache = (creds, token_path, mtime_ns)
+        _schedule_refresh_if_expiring(creds, token_path)
+        return creds
+
+
+def refresh_credentials(rejected_token: str | None) -> Credentials:
+    """Refresh the credentials after the API rejected their access token.
+
+    Nothing is refreshed if the token was already replaced since it was sent,
+    e.g. by another batch that got a 401 at the same time. The credentials
+    are refreshed in place and saved to the token file.
+
+    Args:
+        rejected_token: Access token the API answered with HTTP 401
+
+    Returns:
+        Credentials: Credentials holding a new access token
+
+    Raises:
+        AuthenticationError: If the refresh token is no longer valid
+    """
+    global _credentials_cache
+
+    creds = get_credentials()
+    token_path = config.gmail_api.token_path
+    with _credentials_lock:
+        if creds.token != rejected_token:
+            return creds
+        try:
+            creds.refresh(Request())
+        except RefreshError as e:
+            raise AuthenticationError(
+                "Refresh token is invalid or expired. Re-authentication required, "
+                f"run: uv run gmail-auth (token path: {token_path})",
+                original_error=e,
+            ) from e
+        mtime_ns = _save_token(creds, token_path)
+        if _credentials_cache is not None and _credentials_cache[0] is creds:
+            _credentials_cache = (creds, token_path, mtime_ns)
+    return creds
+
+
+def _save_token(creds: Credentials, token_path: Path) -> int:
+    """Atomically replace the token file and return its new mtime in ns.
+
+    The file is left untouched if it already holds these credentials. When
+    it can't be replaced, e.g. because it is a single-file bind mount in
+    Docker, it is rewritten in place instead.
+    """
+    token_json = creds.to_json()
+    try:
+        if token_path.read_text(encoding="utf-8") == token_json:
+            return token_path.stat().st_mtime_ns
     except FileNotFoundError:
-        raise
-    except ValueError:
-        raise
-    except AuthenticationError:
-        raise
+        pass
+
+    with _token_file_lock(token_path):
+        fd, tmp_name = tempfile.mkstemp(
+            dir=token_path.parent, prefix=f".{token_path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as token:
+                token.write(token_json)
+            try:
+                os.replace(tmp_name, token_path)
+            except OSError as e:
+                if e.errno not in (errno.EBUSY, errno.EXDEV):
+                    raise
+                Path(tmp_name).unlink()
+                token_path.write_text(token_json, encoding="utf-8")
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return token_path.stat().st_mtime_ns
+
+
+@contextmanager
+def _token_file_lock(token_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock, shared with other processes, on the token file."""
+    if fcntl is None:
+        yield
+        return
+    with token_path.with_name(f".{token_path.name}.lock").open("a") as lock_file:
+        # Released when the lock file is closed
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _schedule_refresh_if_expiring(creds: Credentials, token_path: Path) -> None:
+    """Refresh still-valid credentials in the background when they expire soon.
+
+    Must be called with ``_credentials_lock`` held. Credentials are refreshed
+    in place, so services already built with them pick up the new token
+    without a synchronous refresh in the middle of a fetch.
+    """
+    global _refresh_future
+
+    if not _expires_within(creds, BACKGROUND_REFRESH_MARGIN):
+        return
+    if _refresh_future is not None and not _refresh_future.done():
+        return
+    _refresh_future = _refresh_executor.submit(
+        _refresh_in_background, creds, token_path
+    )
+
+
+def _refresh_in_background(creds: Credentials, token_path: Path) -> None:
+    """Refresh credentials and save them, leaving failures to the inline path."""
+    global _credentials_cache
+
+    try:
+        creds.refresh(Request())
+        with _credentials_lock:
+            mtime_ns = _save_token(creds, token_path)
+            if _credentials_cache is not None and _credentials_cache[0] is creds:
+                _credentials_cache = (creds, token_path, mtime_ns)
     except Exception as e:
-        raise AuthenticationError(
-            f"Unexpected error getting credentials: {e}",
-            original_error=e,
-        ) from e
-    return creds
+        log.warning(f"Background token refresh failed: {e}")
+
+
+def _expires_within(creds: Credentials, margin: timedelta) -> bool:
+    """Check whether the credentials' access token expires within ``margin``."""
+    if creds.expiry is None:
+        return False
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(UTC).replace(tzinfo=None)
+    return creds.expiry - now <= margin
+
+
+class ThreadHttpRequest(HttpRequest):
+    """HttpRequest that is sent with an HTTP client owned by the calling thread.
+
+    httplib2.Http is not thread-safe, so requests built from a shared service
+    don't use the service's client. Each thread keeps one authorized client
+    per credentials, which reuses its connection across requests and pages.
+    """
+
+    def execute(self, http: Any = None, num_retries: int = 0) -> Any:
+        if http is None:
+            http = get_thread_http(self.http.credentials)
+        return super().execute(http=http, num_retries=num_retries)
+
+
+def get_thread_http(creds: Credentials) -> AuthorizedHttp:
+    """Get the calling thread's authorized HTTP client for ``creds``.
+
+    httplib2.Http objects are not thread-safe, so requests are sent with one
+    client per thread. It refreshes the credentials when Gmail answers 401.
+    """
+    cached = getattr(_thread_local, "authorized_http", None)
+    if cached is None or cached.credentials is not creds:
+        cached = AuthorizedHttp(creds, http=build_http())
+        _thread_local.authorized_http = cached
+    return cached
 
 
 def get_service():
     """Get authenticated Gmail API service.
 
+    The service is built once and shared by all callers until get_credentials()
+    returns different credentials, e.g. after a refresh or re-authentication,
+    so concurrent extractions reuse one client. Requests are sent with
+    per-thread HTTP clients, which makes the shared service safe to use from
+    multiple threads.
+
     Returns:
         Resource: Authenticated Gmail API service
     """
+    global _service_cache
+
     creds = get_credentials()
-    return build("gmail", "v1", credentials=creds)
+    with _service_lock:
+        if _service_cache is not None and _service_cache[1] is creds:
+            return _service_cache[0]
+
+        service = build(
+            "gmail",
+            "v1",
+            credentials=creds,
+            model=OrjsonModel(),
+            requestBuilder=ThreadHttpRequest,
+            cache_discovery=False,
+        )
+        _service_cache = (service, creds)
+        return service
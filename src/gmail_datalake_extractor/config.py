@@ -14,7 +14,6 @@ class GmailApiConfig(BaseSettings):
         env_file_encoding="utf-8",
         case_sensitive=False,
         extra="ignore",
-        validate_assignment=True,
         use_enum_values=True,
     )
 
@@ -31,7 +30,6 @@ class DatabaseConfig(BaseSettings):
         env_file_encoding="utf-8",
         case_sensitive=False,
         extra="ignore",
-        validate_assignment=True,
         use_enum_values=True,
     )
 
@@ -39,6 +37,14 @@ class DatabaseConfig(BaseSettings):
         description="Path to DuckLake setup SQL file",
         alias="ducklake_setup_path",
     )
+    ingest_batch_size: int = Field(
+        default=500,
+        description="Number of messages fetched before they are saved to DuckLake",
+    )
+    duckdb_threads: int | None = Field(
+        default=None,
+        description="DuckDB worker threads for ingest (defaults to the CPU count)",
+    )
 
 
 class ServerConfig(BaseSettings):
@@ -50,7 +56,6 @@ class ServerConfig(BaseSettings):
         env_file_encoding="utf-8",
         case_sensitive=False,
         extra="ignore",
-        validate_assignment=True,
         use_enum_values=True,
     )
 
@@ -72,7 +77,6 @@ class TaskConfig(BaseSettings):
         env_file_encoding="utf-8",
         case_sensitive=False,
         extra="ignore",
-        validate_assignment=True,
         use_enum_values=True,
     )
 
@@ -86,6 +90,20 @@ class TaskConfig(BaseSettings):
         default=Path("./data/tasks.duckdb"),
         description="Path to task status database file",
     )
+    max_concurrent: int = Field(
+        default=2, description="Maximum number of extraction tasks running at once"
+    )
+    cleanup_interval: float = Field(
+        default=600.0, description="Seconds between sweeps of expired tasks"
+    )
+    flush_interval: float = Field(
+        default=0.5,
+        description="Seconds between writes of buffered task progress updates",
+    )
+    status_poll_interval: float = Field(
+        default=0.5,
+        description="Seconds between task status checks for WebSocket and NDJSON streams",
+    )
 
 
 class Config:
@@ -1,39 +1,50 @@
+import asyncio
 import logging
+import threading
+from collections.abc import AsyncIterator
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import Any
 
 import duckdb
+import pyarrow as pa
 
 from gmail_datalake_extractor.auth import get_service
 from gmail_datalake_extractor.config import config
 from gmail_datalake_extractor.messages import (
-    fetch_messages_with_retry,
+    fetch_messages_with_retry_async,
     get_message_list,
+    iter_messages_with_retry,
 )
 from gmail_datalake_extractor.models import FetchConfig, Message
 
 log = logging.getLogger(__name__)
 
+SQL_DIR = Path(__file__).parent.parent / "sql"
 
-def get_messages(
+_datalake_connection: duckdb.DuckDBPyConnection | None = None
+_datalake_connection_lock = threading.Lock()
+# Concurrent MERGEs into the same DuckLake table fail with transaction conflicts
+_datalake_ingest_lock = threading.Lock()
+
+
+async def list_message_ids(
+    service: Any,
     search_query: str,
     max_results: int,
-    fetch_config: FetchConfig,
-):
-    """Gets messages from Gmail API.
-    Lists recent messages and fetches their metadata efficiently.
+) -> list[str]:
+    """Lists the IDs of messages matching a Gmail search query.
 
     Args:
+        service: Authenticated Gmail API service
         search_query: Gmail search query string
         max_results: Maximum number of messages to return
-        fetch_config: Configuration for message fetching
-    """
 
-    # Get Gmail API service
-    service = get_service()
-
-    # List messages to get IDs
-    messages_response = get_message_list(
+    Raises:
+        ValueError: If no messages match the query
+    """
+    messages_response = await asyncio.to_thread(
+        get_message_list,
         service,
         search_query=search_query,
         max_results=max_results,
@@ -45,54 +56,186 @@ def get_messages(
 
     log.info(f"Found {len(messages_response.messages)} messages")
 
-    # Extract message IDs
-    message_ids = [msg.id for msg in messages_response.messages]
+    return [msg.id for msg in messages_response.messages]
+
+
+def get_messages(
+    search_query: str,
+    max_results: int,
+    fetch_config: FetchConfig,
+) -> list[Message]:
+    """Gets messages from Gmail API.
+
+    Synchronous wrapper around get_messages_async, which it runs in a new
+    event loop, so it can't be called from a running event loop.
+
+    Args:
+        search_query: Gmail search query string
+        max_results: Maximum number of messages to return
+        fetch_config: Configuration for message fetching
+    """
+    return asyncio.run(get_messages_async(search_query, max_results, fetch_config))
+
+
+async def get_messages_async(
+    search_query: str,
+    max_results: int,
+    fetch_config: FetchConfig,
+) -> list[Message]:
+    """Gets messages from Gmail API.
+    Lists recent messages and fetches their metadata efficiently.
+    Blocking Gmail API calls run in worker threads.
+
+    Args:
+        search_query: Gmail search query string
+        max_results: Maximum number of messages to return
+        fetch_config: Configuration for message fetching
+    """
+
+    # Get Gmail API service
+    service = await asyncio.to_thread(get_service)
+
+    # List messages to get IDs
+    message_ids = await list_message_ids(service, search_query, max_results)
 
     # Fetch message metadata in batches with exponential backoff
     log.info("Fetching message metadata...")
-    messages = fetch_messages_with_retry(
+    messages = await fetch_messages_with_retry_async(
         service,
         message_ids,
         fetch_config=fetch_config,
     )
 
     log.info(f"Successfully fetched {len(messages)} messages:")
-    for message in messages:
-        log.debug(f"ID: {message.id}, Thread: {message.threadId}")
+    if log.isEnabledFor(logging.DEBUG):
+        for message in messages:
+            log.debug("ID: %s, Thread: %s", message.id, message.threadId)
 
     return messages
 
 
+async def iter_messages(
+    service: Any,
+    message_ids: list[str],
+    fetch_config: FetchConfig,
+    chunk_size: int,
+) -> AsyncIterator[list[Message]]:
+    """Fetches messages from Gmail API and yields them in chunks.
+
+    Only about one chunk of messages (plus the batches in flight) is held in
+    memory at a time, regardless of how many messages are fetched.
+
+    Args:
+        service: Authenticated Gmail API service
+        message_ids: IDs of the messages to fetch
+        fetch_config: Configuration for message fetching
+        chunk_size: Number of messages per yielded chunk
+    """
+    chunk: list[Message] = []
+    async for batch in iter_messages_with_retry(
+        service,
+        message_ids,
+        fetch_config=fetch_config,
+    ):
+        chunk.extend(batch)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+@lru_cache(maxsize=8)
 def load_sql_file(sql_file_path: Path) -> str:
-    """Load SQL from file."""
-    with sql_file_path.open("r", encoding="utf-8") as f:
-        return f.read().strip()
+    """Load SQL from file, reading each file only once per process."""
+    return sql_file_path.read_text(encoding="utf-8").strip()
+
 
+def _load_httpfs(con: duckdb.DuckDBPyConnection) -> None:
+    """Load httpfs, installing it only if the extension directory lacks it.
 
-def save_to_datalake(messages: List[Message]) -> None:
-    """Saves messages to DuckLake (duckdb data lake) using external SQL files."""
-    # Convert messages to PyArrow table
-    message_table = Message.messages_to_pyarrow_table(messages)
+    The Docker image installs httpfs at build time, so the extension repository
+    is only contacted in environments where it hasn't been installed yet.
+    """
+    try:
+        con.load_extension("httpfs")
+    except duckdb.IOException:
+        log.info("httpfs extension not installed, installing it")
+        con.install_extension("httpfs")
+        con.load_extension("httpfs")
+
+
+def get_datalake_connection() -> duckdb.DuckDBPyConnection:
+    """Get the shared DuckDB connection with DuckLake attached.
 
-    # Load SQL files
-    sql_dir = Path(__file__).parent.parent / "sql"
+    The connection is created on first use: httpfs is loaded, the DuckLake
+    setup SQL from config is run and the lake is attached. Later calls reuse
+    it, so this cost is paid once per process instead of once per save.
+    """
+    global _datalake_connection
+
+    with _datalake_connection_lock:
+        if _datalake_connection is None:
+            log.info("Connecting to DuckLake")
+            duckdb_config = {}
+            if config.database.duckdb_threads is not None:
+                duckdb_config["threads"] = config.database.duckdb_threads
+            con = duckdb.connect(config=duckdb_config)
+            try:
+                _load_httpfs(con)
+                # Initialize DuckLake setup first
+                con.sql(load_sql_file(config.database.ducklake_setup_path))
+                # Then attach
+                con.sql(load_sql_file(SQL_DIR / "attach_ducklake.sql"))
+            except Exception:
+                con.close()
+                raise
+            _datalake_connection = con
+        return _datalake_connection
+
+
+def close_datalake_connection() -> None:
+    """Close the shared DuckLake connection, if it was opened."""
+    global _datalake_connection
+
+    with _datalake_connection_lock:
+        if _datalake_connection is not None:
+            _datalake_connection.close()
+            _datalake_connection = None
+
+
+def save_to_datalake(messages: list[Message]) -> None:
+    """Saves messages to DuckLake (duckdb data lake) using external SQL files.
+
+    Messages are handed to DuckDB as a stream of Arrow record batches, which
+    are converted as the insert consumes them. Each call uses its own cursor
+    on the shared connection, and saves are serialized so concurrent
+    extractions don't conflict on the messages table.
+    """
+    # Stream messages as PyArrow record batches
+    message_table = pa.RecordBatchReader.from_batches(
+        Message.pyarrow_schema(), Message.iter_record_batches(messages)
+    )
 
-    # Load DuckLake setup SQL from config path
-    ducklake_setup_sql = load_sql_file(config.database.ducklake_setup_path)
-    # Load attach SQL file (now simplified)
-    attach_sql = load_sql_file(sql_dir / "attach_ducklake.sql")
     # Load ingest SQL file
-    ingest_sql = load_sql_file(sql_dir / "create_and_insert_messages.sql")
+    ingest_sql = load_sql_file(SQL_DIR / "create_and_insert_messages.sql")
 
     log.info("Running SQL files")
 
     # Execute database operations
-    with duckdb.connect() as con:
-        con.install_extension("httpfs")
-        # Initialize DuckLake setup first
-        con.sql(ducklake_setup_sql)
-        # Then attach and insert data
-        con.sql(attach_sql)
+    with _datalake_ingest_lock, get_datalake_connection().cursor() as con:
         con.register("message_table", message_table)
-        con.sql(ingest_sql)
+        try:
+            # One transaction, so the table check and the MERGE commit together
+            con.begin()
+            try:
+                con.execute(ingest_sql)
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+        finally:
+            # Release the Arrow stream, and the messages it references, right away
+            con.unregister("message_table")
     log.info("All SQL files executed successfully")
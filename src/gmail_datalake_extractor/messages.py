@@ -1,15 +1,47 @@
 """Gmail message operations and utilities."""
 
+import asyncio
 import logging
-import time
+import random
+from collections import deque
+from collections.abc import AsyncIterator
 from typing import Any, Literal
 
+import httpx
+import orjson
 from googleapiclient.errors import HttpError
 
+from gmail_datalake_extractor.auth import (
+    get_credentials,
+    get_thread_http,
+    refresh_credentials,
+)
 from gmail_datalake_extractor.models import FetchConfig, ListMessagesResponse, Message
 
 log = logging.getLogger(__name__)
 
+# Gmail rejects batch requests with more than 100 inner requests
+MAX_MESSAGES_PER_BATCH = 100
+
+# Per-message errors worth retrying; others (e.g. 404 for deleted messages) are final
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Error reasons of the HTTP 403s Gmail returns for exceeded rate limits
+RATE_LIMIT_REASONS = frozenset({"rateLimitExceeded", "userRateLimitExceeded"})
+
+# Error message of the HTTP 400 returned for batches above the inner request limit
+BATCH_LIMIT_ERROR = "inner request count exceeds the limit"
+
+# Upper bound on batch requests in flight, to stay clear of Gmail's
+# "Too many concurrent requests for user" rate limiting
+MAX_CONCURRENT_BATCHES = 8
+
+# Base URL of the Gmail REST API, used when fetching messages over HTTP/2
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1/"
+
+# Headers requested for 'metadata' format fetches unless the caller picks others
+DEFAULT_METADATA_HEADERS = ("From", "Subject", "Date", "To", "Message-ID")
+
 
 def get_message_list(
     gmail_service: Any,
@@ -17,7 +49,7 @@ def get_message_list(
     max_results: int = 500,
     handle_error: bool = True,
 ) -> ListMessagesResponse:
-    """Get message list with LRU caching to reduce API calls during development.
+    """Get the list of messages matching a Gmail search query.
 
     Args:
         gmail_service: Authenticated Gmail API service
@@ -40,30 +72,48 @@ def get_message_list(
             .list(userId="me", q=search_query, maxResults=max_results)
             .execute()
         )
-        messages = ListMessagesResponse.model_validate(response)
-        return messages
     except HttpError as error:
         if handle_error:
             return ListMessagesResponse(messages=[])
         raise error
 
+    # Listed messages only carry opaque id/threadId strings, so skip validation.
+    # Gmail leaves out "messages" entirely when nothing matches the query.
+    return ListMessagesResponse.model_construct(
+        messages=[
+            Message.model_construct(id=message["id"], threadId=message["threadId"])
+            for message in response.get("messages", [])
+        ],
+        nextPageToken=response.get("nextPageToken"),
+        resultSizeEstimate=response.get("resultSizeEstimate"),
+    )
+
 
 def execute_single_batch(
     gmail_service: Any,
     message_ids_to_fetch: list[str],
     response_format: Literal["metadata", "full", "minimal", "raw"] = "metadata",
     metadata_headers: list[str] | None = None,
+    http: Any = None,
 ) -> tuple[list[Message], set[str]]:
     """Execute a single batch request to fetch multiple messages.
 
+    Messages that fail with a non-retryable error (see _is_retryable_error)
+    or can't be parsed are logged and dropped rather than reported as failed.
+
     Args:
         gmail_service: Authenticated Gmail API service
         message_ids_to_fetch: List of message IDs to fetch in this batch
         response_format: Message format ('metadata', 'full', 'minimal', 'raw')
         metadata_headers: Headers to include when format is 'metadata'
+        http: HTTP client to send the batch with (defaults to the service's)
 
     Returns:
-        tuple: (successfully_fetched_messages, failed_message_ids)
+        tuple: (successfully_fetched_messages, failed_message_ids) where
+        failed_message_ids holds the messages worth retrying
+
+    Raises:
+        HttpError: If Gmail rejects the batch for exceeding the inner request limit
     """
 
     successfully_fetched_messages = []
@@ -73,36 +123,40 @@ def execute_single_batch(
         message_id: str, api_response: Any, error: Exception | None
     ) -> None:
         """Handle individual message responses within the batch."""
+        # Runs once per message, so log lazily instead of with f-strings
         if error:
-            log.warning(f"Error fetching message {message_id}: {error}")
-            failed_message_ids.add(message_id)
+            if isinstance(error, HttpError) and not _is_retryable_error(
+                error.resp.status, error.content
+            ):
+                log.error("Skipping message %s: %s", message_id, error)
+            else:
+                log.warning("Error fetching message %s: %s", message_id, error)
+                failed_message_ids.add(message_id)
         else:
             try:
                 message_data = Message.model_validate(api_response)
                 successfully_fetched_messages.append(message_data)
             except Exception as e:
-                log.error(f"Parsing error for message {message_id}: {e}")
-                failed_message_ids.add(message_id)
+                log.error("Parsing error for message %s: %s", message_id, e)
+
+    # Only 'metadata' requests take header names; leave the parameter out otherwise
+    get_kwargs: dict[str, Any] = {"userId": "me", "format": response_format}
+    if response_format == "metadata" and metadata_headers:
+        get_kwargs["metadataHeaders"] = metadata_headers
 
     batch_request = gmail_service.new_batch_http_request(callback=batch_callback)
+    messages_resource = gmail_service.users().messages()
     for message_id in message_ids_to_fetch:
         batch_request.add(
-            gmail_service.users()
-            .messages()
-            .get(
-                userId="me",
-                id=message_id,
-                format=response_format,
-                metadataHeaders=metadata_headers
-                if response_format == "metadata"
-                else None,
-            ),
+            messages_resource.get(id=message_id, **get_kwargs),
             request_id=message_id,
         )
 
     try:
-        batch_request.execute()
+        batch_request.execute(http=http)
     except HttpError as error:
+        if _exceeds_batch_limit(error):
+            raise
         log.error(f"Batch execution failed: {error}")
         # Only mark unprocessed messages as failed
         successfully_processed_ids = {msg.id for msg in successfully_fetched_messages}
@@ -116,7 +170,153 @@ def execute_single_batch(
     return successfully_fetched_messages, failed_message_ids
 
 
-def fetch_messages_with_retry(
+def _is_retryable_error(status: int, content: bytes) -> bool:
+    """Check whether a message that failed with this HTTP error is worth retrying.
+
+    Besides RETRYABLE_STATUS_CODES, Gmail reports per-user quota errors as
+    HTTP 403 with a rate limit reason in the error body.
+    """
+    if status in RETRYABLE_STATUS_CODES:
+        return True
+    if status != 403:
+        return False
+    try:
+        errors = orjson.loads(content)["error"]["errors"]
+        return any(error.get("reason") in RATE_LIMIT_REASONS for error in errors)
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        return False
+
+
+def _exceeds_batch_limit(error: HttpError) -> bool:
+    """Check whether a batch was rejected for having too many inner requests."""
+    return error.resp.status == 400 and BATCH_LIMIT_ERROR in str(error).lower()
+
+
+def _execute_batch_on_thread_http(
+    gmail_service: Any,
+    message_ids_to_fetch: list[str],
+    response_format: Literal["metadata", "full", "minimal", "raw"],
+    metadata_headers: list[str] | None,
+) -> tuple[list[Message], set[str]]:
+    """Run execute_single_batch with the calling thread's authorized HTTP client.
+
+    If Gmail rejects the batch for exceeding its inner request limit, the batch
+    is split in half and both halves are executed, so fetching keeps working if
+    the limit is ever lowered below MAX_MESSAGES_PER_BATCH.
+    """
+    try:
+        return execute_single_batch(
+            gmail_service,
+            message_ids_to_fetch,
+            response_format,
+            metadata_headers,
+            http=get_thread_http(get_credentials()),
+        )
+    except HttpError as error:
+        if len(message_ids_to_fetch) == 1:
+            log.error(f"Batch execution failed: {error}")
+            return [], set(message_ids_to_fetch)
+
+    half = len(message_ids_to_fetch) // 2
+    log.warning(
+        f"Batch of {len(message_ids_to_fetch)} messages exceeds the Gmail limit, "
+        f"splitting into batches of {half} and {len(message_ids_to_fetch) - half}"
+    )
+    first_messages, first_failed = _execute_batch_on_thread_http(
+        gmail_service, message_ids_to_fetch[:half], response_format, metadata_headers
+    )
+    second_messages, second_failed = _execute_batch_on_thread_http(
+        gmail_service, message_ids_to_fetch[half:], response_format, metadata_headers
+    )
+    return first_messages + second_messages, first_failed | second_failed
+
+
+def _new_http2_client() -> httpx.AsyncClient:
+    """Create the HTTP/2 client shared by all batches of one fetch."""
+    return httpx.AsyncClient(
+        http2=True,
+        base_url=GMAIL_API_URL,
+        timeout=httpx.Timeout(60.0),
+        limits=httpx.Limits(max_keepalive_connections=20),
+    )
+
+
+async def execute_http2_requests(
+    client: httpx.AsyncClient,
+    message_ids_to_fetch: list[str],
+    response_format: Literal["metadata", "full", "minimal", "raw"] = "metadata",
+    metadata_headers: list[str] | None = None,
+) -> tuple[list[Message], set[str]]:
+    """Fetch messages with one messages.get request each over HTTP/2.
+
+    The requests are multiplexed on the client's connections, so each message
+    is parsed as soon as its own response arrives instead of after the whole
+    multipart batch response. Errors are handled like in execute_single_batch.
+    An HTTP 401 means the access token was rejected: the credentials are
+    refreshed and the messages it failed are retried.
+
+    Args:
+        client: HTTP/2 client with GMAIL_API_URL as its base URL
+        message_ids_to_fetch: List of message IDs to fetch
+        response_format: Message format ('metadata', 'full', 'minimal', 'raw')
+        metadata_headers: Headers to include when format is 'metadata'
+
+    Returns:
+        tuple: (successfully_fetched_messages, failed_message_ids) where
+        failed_message_ids holds the messages worth retrying
+    """
+    creds = await asyncio.to_thread(get_credentials)
+    headers = {"Authorization": f"Bearer {creds.token}"}
+    params: dict[str, Any] = {"format": response_format}
+    if response_format == "metadata" and metadata_headers:
+        params["metadataHeaders"] = metadata_headers
+
+    responses = await asyncio.gather(
+        *(
+            client.get(
+                f"users/me/messages/{message_id}", params=params, headers=headers
+            )
+            for message_id in message_ids_to_fetch
+        ),
+        return_exceptions=True,
+    )
+
+    successfully_fetched_messages = []
+    failed_message_ids = set()
+    token_rejected = False
+    # Runs once per message, so log lazily instead of with f-strings
+    for message_id, response in zip(message_ids_to_fetch, responses):
+        if isinstance(response, httpx.HTTPError):
+            log.warning("Error fetching message %s: %s", message_id, response)
+            failed_message_ids.add(message_id)
+        elif isinstance(response, BaseException):
+            raise response
+        elif response.status_code == 401:
+            token_rejected = True
+            failed_message_ids.add(message_id)
+        elif _is_retryable_error(response.status_code, response.content):
+            log.warning(
+                "Error fetching message %s: HTTP %s", message_id, response.status_code
+            )
+            failed_message_ids.add(message_id)
+        elif response.is_error:
+            log.error("Skipping message %s: HTTP %s", message_id, response.status_code)
+        else:
+            try:
+                successfully_fetched_messages.append(
+                    Message.model_validate_json(response.content)
+                )
+            except Exception as e:
+                log.error("Parsing error for message %s: %s", message_id, e)
+
+    if token_rejected:
+        log.warning("Access token rejected, refreshing credentials")
+        await asyncio.to_thread(refresh_credentials, creds.token)
+
+    return successfully_fetched_messages, failed_message_ids
+
+
+async def iter_messages_with_retry(
     gmail_service: Any,
     message_ids_to_fetch: list[str],
     messages_per_batch: int = 50,
@@ -124,22 +324,32 @@ def fetch_messages_with_retry(
     metadata_headers: list[str] | None = None,
     max_retry_attempts: int = 3,
     initial_retry_delay: float = 1.0,
+    use_http2: bool = False,
     fetch_config: FetchConfig | None = None,
-) -> list[Message]:
-    """Fetch multiple messages efficiently using batch requests with automatic retry.
+) -> AsyncIterator[list[Message]]:
+    """Fetch messages using batch requests with automatic retry, one batch at a time.
+
+    Batches are executed concurrently in worker threads, at most
+    MAX_CONCURRENT_BATCHES at a time, and yielded in order. New batches are
+    only started as the caller consumes results, so memory use is bounded by
+    the number of batches in flight rather than the number of messages.
+    With use_http2, each batch is sent as individual requests multiplexed over
+    one HTTP/2 client instead of as a Gmail batch request.
 
     Args:
         gmail_service: Authenticated Gmail API service
         message_ids_to_fetch: List of message IDs to fetch
-        messages_per_batch: Number of messages per batch (recommended max 50)
+        messages_per_batch: Number of messages per batch (recommended max 50,
+            capped at MAX_MESSAGES_PER_BATCH)
         response_format: Message format ('metadata', 'full', 'minimal', 'raw')
         metadata_headers: Headers to include when format is 'metadata'
         max_retry_attempts: Maximum number of retry attempts for failed batches
         initial_retry_delay: Base delay in seconds for exponential backoff
+        use_http2: Fetch messages individually over HTTP/2 instead of batching
         fetch_config: Optional FetchConfig to override individual parameters
 
-    Returns:
-        list[Message]: List of successfully fetched messages
+    Yields:
+        list[Message]: Successfully fetched messages of each batch
     """
     # Use fetch_config values if provided, otherwise use individual parameters
     if fetch_config is not None:
@@ -148,54 +358,204 @@ def fetch_messages_with_retry(
         metadata_headers = fetch_config.metadata_headers
         max_retry_attempts = fetch_config.max_retry_attempts
         initial_retry_delay = fetch_config.initial_retry_delay
+        use_http2 = fetch_config.use_http2
 
-    if metadata_headers is None:
-        metadata_headers = ["From", "Subject", "Date", "To"]
+    if response_format != "metadata":
+        metadata_headers = None
+    elif metadata_headers is None:
+        metadata_headers = list(DEFAULT_METADATA_HEADERS)
 
-    all_successfully_fetched_messages = []
+    if messages_per_batch > MAX_MESSAGES_PER_BATCH:
+        log.warning(
+            f"messages_per_batch={messages_per_batch} exceeds the Gmail batch limit, "
+            f"using {MAX_MESSAGES_PER_BATCH}"
+        )
+        messages_per_batch = MAX_MESSAGES_PER_BATCH
 
     log.info(
         f"Fetching {len(message_ids_to_fetch)} messages in batches of {messages_per_batch}"
     )
-    # Process messages in batches
-    for batch_start_index in range(0, len(message_ids_to_fetch), messages_per_batch):
-        current_batch_message_ids = message_ids_to_fetch[
-            batch_start_index : batch_start_index + messages_per_batch
-        ]
-        batch_number = batch_start_index // messages_per_batch + 1
+    pending_batches: deque[asyncio.Task[list[Message]]] = deque()
+    http2_client = _new_http2_client() if use_http2 else None
+    try:
+        for batch_number, batch_start_index in enumerate(
+            range(0, len(message_ids_to_fetch), messages_per_batch), start=1
+        ):
+            pending_batches.append(
+                asyncio.create_task(
+                    _fetch_batch_with_retry(
+                        gmail_service,
+                        message_ids_to_fetch[
+                            batch_start_index : batch_start_index + messages_per_batch
+                        ],
+                        batch_number,
+                        response_format,
+                        metadata_headers,
+                        max_retry_attempts,
+                        initial_retry_delay,
+                        http2_client,
+                    )
+                )
+            )
+            if len(pending_batches) >= MAX_CONCURRENT_BATCHES:
+                yield await pending_batches.popleft()
 
-        retry_attempt = 0
+        while pending_batches:
+            yield await pending_batches.popleft()
+    finally:
+        # Stop batches still in flight if the caller stops early or fails
+        for task in pending_batches:
+            task.cancel()
+        if http2_client is not None:
+            if pending_batches:
+                await asyncio.gather(*pending_batches, return_exceptions=True)
+            await http2_client.aclose()
 
-        while (
-            len(current_batch_message_ids) > 0 and retry_attempt <= max_retry_attempts
-        ):
-            batch_results, failed_message_ids = execute_single_batch(
+
+def fetch_messages_with_retry(
+    gmail_service: Any,
+    message_ids_to_fetch: list[str],
+    messages_per_batch: int = 50,
+    response_format: Literal["metadata", "full", "minimal", "raw"] = "metadata",
+    metadata_headers: list[str] | None = None,
+    max_retry_attempts: int = 3,
+    initial_retry_delay: float = 1.0,
+    use_http2: bool = False,
+    fetch_config: FetchConfig | None = None,
+) -> list[Message]:
+    """Fetch multiple messages using batch requests with automatic retry.
+
+    Synchronous wrapper around fetch_messages_with_retry_async, which it runs
+    in a new event loop, so it can't be called from a running event loop.
+    See fetch_messages_with_retry_async for the arguments.
+
+    Returns:
+        list[Message]: List of successfully fetched messages
+    """
+    return asyncio.run(
+        fetch_messages_with_retry_async(
+            gmail_service,
+            message_ids_to_fetch,
+            messages_per_batch=messages_per_batch,
+            response_format=response_format,
+            metadata_headers=metadata_headers,
+            max_retry_attempts=max_retry_attempts,
+            initial_retry_delay=initial_retry_delay,
+            use_http2=use_http2,
+            fetch_config=fetch_config,
+        )
+    )
+
+
+async def fetch_messages_with_retry_async(
+    gmail_service: Any,
+    message_ids_to_fetch: list[str],
+    messages_per_batch: int = 50,
+    response_format: Literal["metadata", "full", "minimal", "raw"] = "metadata",
+    metadata_headers: list[str] | None = None,
+    max_retry_attempts: int = 3,
+    initial_retry_delay: float = 1.0,
+    use_http2: bool = False,
+    fetch_config: FetchConfig | None = None,
+) -> list[Message]:
+    """Fetch multiple messages efficiently using batch requests with automatic retry.
+
+    Collects all batches of iter_messages_with_retry into a single list.
+
+    Args:
+        gmail_service: Authenticated Gmail API service
+        message_ids_to_fetch: List of message IDs to fetch
+        messages_per_batch: Number of messages per batch (recommended max 50,
+            capped at MAX_MESSAGES_PER_BATCH)
+        response_format: Message format ('metadata', 'full', 'minimal', 'raw')
+        metadata_headers: Headers to include when format is 'metadata'
+        max_retry_attempts: Maximum number of retry attempts for failed batches
+        initial_retry_delay: Base delay in seconds for exponential backoff
+        use_http2: Fetch messages individually over HTTP/2 instead of batching
+        fetch_config: Optional FetchConfig to override individual parameters
+
+    Returns:
+        list[Message]: List of successfully fetched messages
+    """
+    all_successfully_fetched_messages = []
+    async for batch in iter_messages_with_retry(
+        gmail_service,
+        message_ids_to_fetch,
+        messages_per_batch=messages_per_batch,
+        response_format=response_format,
+        metadata_headers=metadata_headers,
+        max_retry_attempts=max_retry_attempts,
+        initial_retry_delay=initial_retry_delay,
+        use_http2=use_http2,
+        fetch_config=fetch_config,
+    ):
+        all_successfully_fetched_messages.extend(batch)
+
+    log.info(
+        f"Successfully fetched {len(all_successfully_fetched_messages)} out of {len(message_ids_to_fetch)} messages"
+    )
+    return all_successfully_fetched_messages
+
+
+async def _fetch_batch_with_retry(
+    gmail_service: Any,
+    current_batch_message_ids: list[str],
+    batch_number: int,
+    response_format: Literal["metadata", "full", "minimal", "raw"],
+    metadata_headers: list[str] | None,
+    max_retry_attempts: int,
+    initial_retry_delay: float,
+    http2_client: httpx.AsyncClient | None = None,
+) -> list[Message]:
+    """Fetch one batch of messages, retrying failed messages with exponential backoff.
+
+    Only the messages that failed with a retryable error are sent again, and a
+    random jitter is added to each delay so concurrent batches that were rate
+    limited together don't retry in lockstep.
+
+    Returns:
+        list[Message]: Successfully fetched messages of this batch
+    """
+    fetched_messages = []
+    retry_attempt = 0
+
+    while current_batch_message_ids and retry_attempt <= max_retry_attempts:
+        if http2_client is not None:
+            batch_results, failed_message_ids = await execute_http2_requests(
+                http2_client,
+                current_batch_message_ids,
+                response_format,
+                metadata_headers,
+            )
+        else:
+            batch_results, failed_message_ids = await asyncio.to_thread(
+                _execute_batch_on_thread_http,
                 gmail_service,
                 current_batch_message_ids,
                 response_format,
                 metadata_headers,
             )
-            all_successfully_fetched_messages.extend(batch_results)
+        fetched_messages.extend(batch_results)
 
-            if len(failed_message_ids) == 0:
-                break
+        if not failed_message_ids:
+            break
 
-            current_batch_message_ids = list(failed_message_ids)
-            retry_attempt += 1
+        # A list, since batches over Gmail's limit are split by slicing
+        current_batch_message_ids = list(failed_message_ids)
+        retry_attempt += 1
 
-            if retry_attempt <= max_retry_attempts:
-                # Exponential backoff: 1s, 2s, 4s...
-                retry_delay = initial_retry_delay * (2 ** (retry_attempt - 1))
-                log.warning(
-                    f"Retrying batch {batch_number} in {retry_delay}s (attempt {retry_attempt}/{max_retry_attempts + 1})"
-                )
-                time.sleep(retry_delay)
-            else:
-                log.error(
-                    f"Max retries exceeded for batch {batch_number}. Giving up on {len(failed_message_ids)} messages."
-                )
+        if retry_attempt <= max_retry_attempts:
+            # Exponential backoff: 1s, 2s, 4s... plus up to one base delay of jitter
+            retry_delay = initial_retry_delay * (
+                2 ** (retry_attempt - 1) + random.random()
+            )
+            log.warning(
+                f"Retrying batch {batch_number} in {retry_delay:.2f}s (attempt {retry_attempt}/{max_retry_attempts + 1})"
+            )
+            await asyncio.sleep(retry_delay)
+        else:
+            log.error(
+                f"Max retries exceeded for batch {batch_number}. Giving up on {len(failed_message_ids)} messages."
+            )
 
-    log.info(
-        f"Successfully fetched {len(all_successfully_fetched_messages)} out of {len(message_ids_to_fetch)} messages"
-    )
-    return all_successfully_fetched_messages
+    return fetched_messages
@@ -1,16 +1,64 @@
 """Pydantic data models for Gmail API responses."""
 
-import base64
-import json
-import tempfile
-from typing import Annotated, Literal, Self
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Annotated, Any, Literal, Self
 
+import orjson
 import pyarrow as pa
-import pyarrow.json as pajson
-from pydantic import BaseModel, BeforeValidator, PlainSerializer
+import pyarrow.compute as pc
+import pybase64
+from pydantic import (
+    BaseModel,
+    BeforeValidator,
+    ConfigDict,
+    PlainSerializer,
+    PrivateAttr,
+    ValidatorFunctionWrapHandler,
+    WrapValidator,
+)
 
+# Quoted MIME type of HTML parts, as it appears in payload JSON
+HTML_MIME_TYPE_JSON = '"text/html"'
 
-class Header(BaseModel):
+
+def decode_base64url(data: str) -> str:
+    """Decode Gmail's unpadded base64url-encoded body data to a string."""
+    # pybase64 uses SIMD decoders, around 10x faster than the base64 module
+    data += "=" * (-len(data) % 4)
+    return pybase64.urlsafe_b64decode(data).decode("utf-8", errors="ignore")
+
+
+def get_html_from_payload(payload: dict[str, Any]) -> str | None:
+    """Extract HTML content from a raw (dict) message payload.
+
+    Same lookup as MessagePart.get_html_content, but walks the parsed JSON
+    directly, so no MessagePart/Header/MessagePartBody objects are built.
+
+    Args:
+        payload: Gmail message payload as parsed from JSON
+
+    Returns:
+        HTML string or None if no HTML content found
+    """
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get("mimeType") == "text/html":
+            data = (part.get("body") or {}).get("data")
+            if data:
+                html = decode_base64url(data)
+                if html:
+                    return html
+        if part.get("parts"):
+            stack.extend(reversed(part["parts"]))
+
+    return None
+
+
+@dataclass(slots=True, frozen=True)
+class Header:
     """Gmail API Header model."""
 
     name: str
@@ -20,6 +68,8 @@ class Header(BaseModel):
 class MessagePartBody(BaseModel):
     """Gmail API MessagePartBody model."""
 
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     attachmentId: str | None = None
     size: int | None = None
     data: str | None = None
@@ -33,18 +83,14 @@ class MessagePartBody(BaseModel):
         if not self.data:
             return None
 
-        # Gmail uses base64url encoding (URL-safe base64)
-        data = self.data
-        padding = 4 - len(data) % 4
-        if padding != 4:
-            data += "=" * padding
-        data = data.replace("-", "+").replace("_", "/")
-        return base64.b64decode(data).decode("utf-8", errors="ignore")
+        return decode_base64url(self.data)
 
 
 class MessagePart(BaseModel):
     """Gmail API MessagePart model."""
 
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     partId: str | None = None
     mimeType: str | None = None
     filename: str | None = None
@@ -52,22 +98,50 @@ class MessagePart(BaseModel):
     body: MessagePartBody | None = None
     parts: list["MessagePart"] | None = None
 
+    # JSON text the part was validated from, set by _keep_raw_json
+    _raw_json: str | None = PrivateAttr(default=None)
+
+    @cached_property
+    def _header_values(self) -> dict[str, str]:
+        """Header values keyed by lower-cased name, built on first lookup."""
+        values: dict[str, str] = {}
+        for header in self.headers or []:
+            # Keep the first occurrence, as for repeated headers like Received
+            values.setdefault(header.name.lower(), header.value)
+        return values
+
+    def get_header(self, name: str) -> str | None:
+        """Get the value of a header of this part by case-insensitive name.
+
+        Headers stay a list to preserve repeated headers; lookups go through a
+        dict built once per part, so they are O(1) after the first.
+
+        Args:
+            name: Header name, e.g. "Subject"
+
+        Returns:
+            Value of the first header with that name, or None if there is none
+        """
+        return self._header_values.get(name.lower())
+
     def get_html_content(self) -> str | None:
-        """Recursively extract HTML content from this part and nested parts.
+        """Extract HTML content from this part and nested parts.
+
+        Parts are searched depth-first in document order using an explicit
+        stack rather than recursion.
 
         Returns:
             HTML string or None if no HTML content found
         """
-        # Check if this part is HTML
-        if self.mimeType == "text/html" and self.body:
-            return self.body.decode_data()
-
-        # Recursively check nested parts
-        if self.parts:
-            for part in self.parts:
-                html = part.get_html_content()
+        stack: list[MessagePart] = [self]
+        while stack:
+            part = stack.pop()
+            if part.mimeType == "text/html" and part.body:
+                html = part.body.decode_data()
                 if html:
                     return html
+            if part.parts:
+                stack.extend(reversed(part.parts))
 
         return None
 
@@ -87,14 +161,17 @@ def serialize_payload_to_json(value: MessagePart | dict | None) -> str | None:
     if value is None:
         return None
 
-    # Handle both MessagePart instances and dicts
+    # Handle both MessagePart instances and dicts. pydantic's Rust serializer is
+    # faster for models than model_dump() + orjson, orjson is faster for dicts
     if isinstance(value, MessagePart):
+        if value._raw_json is not None:
+            return value._raw_json
         return value.model_dump_json()
     elif isinstance(value, dict):
-        return json.dumps(value)
+        return orjson.dumps(value).decode()
     else:
         # Fallback: try to serialize as JSON
-        return json.dumps(value)
+        return orjson.dumps(value).decode()
 
 
 def deserialize_payload_from_json(
@@ -121,8 +198,8 @@ def deserialize_payload_from_json(
     # If it's a string, try to parse it as JSON
     if isinstance(value, str):
         try:
-            return json.loads(value)
-        except (json.JSONDecodeError, TypeError):
+            return orjson.loads(value)
+        except (orjson.JSONDecodeError, TypeError):
             # If JSON parsing fails, return None
             # (fallback for backwards compatibility)
             return None
@@ -130,16 +207,88 @@ def deserialize_payload_from_json(
     return value
 
 
+def _keep_raw_json(part: MessagePart, source: str | dict[str, Any]) -> MessagePart:
+    """Remember the JSON a payload was validated from, for serialize_payload_to_json.
+
+    ``source`` is the payload's JSON string or its dict, which is dumped with
+    orjson. Dicts that orjson can't serialize are skipped.
+
+    It is set on the instance past pydantic's __setattr__, so it is ignored by
+    equality and model_dump(). MessagePart is frozen, so the JSON can only go
+    stale through model_copy(update=...), which the codebase doesn't use on
+    payloads.
+    """
+    if isinstance(source, dict):
+        try:
+            source = orjson.dumps(source).decode()
+        except TypeError:
+            return part
+    object.__setattr__(part, "_raw_json", source)
+    return part
+
+
+def _validate_payload_keeping_raw_json(
+    value: Any, handler: ValidatorFunctionWrapHandler
+) -> MessagePart | None:
+    """Validate a payload and keep its original JSON to skip re-serialization.
+
+    Payloads arrive as dicts from the Gmail API or as JSON strings from stored
+    tables. Keeping them as JSON (an orjson dump of the dict, or the string
+    itself) is much cheaper than model_dump_json() on the validated model.
+    """
+    part: MessagePart | None = handler(value)
+    if part is not None and part is not value and isinstance(value, (str, dict)):
+        _keep_raw_json(part, value)
+    return part
+
+
+def _validate_payload_dict(value: dict[str, Any]) -> MessagePart:
+    """Validate a payload dict into a MessagePart, keeping its JSON."""
+    return _keep_raw_json(MessagePart.model_validate(value), value)
+
+
+def _validate_payload_json(value: str | None) -> MessagePart | None:
+    """Parse a stored payload JSON string straight into a MessagePart.
+
+    Invalid JSON yields None, matching deserialize_payload_from_json.
+    """
+    if value is None:
+        return None
+    try:
+        return _keep_raw_json(MessagePart.model_validate_json(value), value)
+    except ValueError:
+        return None
+
+
 MessagePartJsonSerialized = Annotated[
     MessagePart | None,
     BeforeValidator(deserialize_payload_from_json),
+    WrapValidator(_validate_payload_keeping_raw_json),
     PlainSerializer(serialize_payload_to_json, when_used="json"),
 ]
 
 
+# Arrow schema of stored messages; nested objects (like payload) are JSON strings
+MESSAGE_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("threadId", pa.string(), nullable=False),
+        pa.field("labelIds", pa.list_(pa.string()), nullable=True),
+        pa.field("snippet", pa.string(), nullable=True),
+        pa.field("historyId", pa.string(), nullable=True),
+        pa.field("internalDate", pa.string(), nullable=True),
+        pa.field("payload", pa.string(), nullable=True),
+        pa.field("sizeEstimate", pa.int64(), nullable=True),
+        pa.field("raw", pa.string(), nullable=True),
+    ]
+)
+
+
 class Message(BaseModel):
     """Gmail API Message model."""
 
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     id: str
     threadId: str
     labelIds: list[str] | None = None
@@ -156,53 +305,99 @@ class Message(BaseModel):
         Returns:
             HTML string or None if no HTML content found
         """
-        if not self.payload:
+        # The payload validator already turned JSON strings and dicts into a
+        # MessagePart, so there is nothing to re-validate here
+        if self.payload is None:
             return None
 
-        # Ensure payload is a MessagePart instance
-        if isinstance(self.payload, str):
-            payload = json.loads(self.payload)
-            payload = MessagePart.model_validate(payload)
-        elif isinstance(self.payload, dict):
-            payload = MessagePart.model_validate(self.payload)
-        elif isinstance(self.payload, MessagePart):
-            payload = self.payload
-        else:
+        return self.payload.get_html_content()
+
+    def get_header(self, name: str) -> str | None:
+        """Get the value of a top-level message header by case-insensitive name.
+
+        Args:
+            name: Header name, e.g. "Subject"
+
+        Returns:
+            Header value, or None if the message has no payload or no such header
+        """
+        if self.payload is None:
             return None
 
-        return payload.get_html_content()
+        return self.payload.get_header(name)
+
+    def has_html_payload(self) -> bool:
+        """Cheaply check whether the payload may contain an HTML part.
+
+        Scans the payload's JSON text for the text/html MIME type instead of
+        walking the parts. It never misses an HTML part but can report one
+        that has no content (e.g. a header value of exactly "text/html"), so
+        use it to skip get_html_body for messages that certainly have none.
+
+        Returns:
+            False if the payload has no HTML part, True if it may have one
+        """
+        payload_json = serialize_payload_to_json(self.payload)
+        return payload_json is not None and HTML_MIME_TYPE_JSON in payload_json
+
+    @classmethod
+    def from_trusted_dict(cls, data: dict[str, Any]) -> Self:
+        """Create a Message from trusted data, skipping top-level validation.
+
+        For data whose top-level fields are known to have the right types,
+        like Gmail API responses or rows read back from a message table. Only
+        the payload is validated into a MessagePart (from a dict or a JSON
+        string), since its nested parts are needed as models.
+
+        Args:
+            data: Message fields as returned by the Gmail API
+
+        Returns:
+            Message instance
+        """
+        payload = data.get("payload")
+        if isinstance(payload, str):
+            data = {**data, "payload": _validate_payload_json(payload)}
+        elif isinstance(payload, dict):
+            data = {**data, "payload": _validate_payload_dict(payload)}
+        return cls.model_construct(**data)
 
     @classmethod
     def pyarrow_schema(cls) -> pa.Schema:
         """Get the PyArrow schema for Message table.
 
         Defines the explicit schema for storing Message data in PyArrow tables.
-        Nested objects (like payload) are stored as JSON strings.
+        Nested objects (like payload) are stored as JSON strings. The schema is
+        built once at import time and shared by every conversion.
 
         Returns:
             PyArrow schema matching the Message model structure
         """
-        return pa.schema(
-            [
-                pa.field("id", pa.string(), nullable=False),
-                pa.field("threadId", pa.string(), nullable=False),
-                pa.field("labelIds", pa.list_(pa.string()), nullable=True),
-                pa.field("snippet", pa.string(), nullable=True),
-                pa.field("historyId", pa.string(), nullable=True),
-                pa.field("internalDate", pa.string(), nullable=True),
-                pa.field("payload", pa.string(), nullable=True),  # JSON string
-                pa.field("sizeEstimate", pa.int64(), nullable=True),
-                pa.field("raw", pa.string(), nullable=True),
-            ]
-        )
+        return MESSAGE_SCHEMA
+
+    @classmethod
+    def _to_pyarrow_columns(cls, messages: list[Self]) -> dict[str, list]:
+        """Collect message fields into one Python list per PyArrow schema column.
+
+        Nested objects (like payload) are serialized to JSON strings, which
+        PyArrow tables don't handle well as nested structures.
+        """
+        columns: dict[str, list] = {}
+        for name in MESSAGE_SCHEMA.names:
+            if name == "payload":
+                columns[name] = [
+                    serialize_payload_to_json(msg.payload) for msg in messages
+                ]
+            else:
+                columns[name] = [getattr(msg, name) for msg in messages]
+        return columns
 
     @classmethod
     def messages_to_pyarrow_table(cls, messages: list[Self]) -> pa.Table:
-        """Convert a list of Messages to a PyArrow table using PyArrow's JSON reader.
+        """Convert a list of Messages to a PyArrow table.
 
-        Leverages PyArrow's JSON reading with automatic type inference.
-        Serializes nested objects (like payload) to JSON strings for proper storage
-        in PyArrow tables, which don't handle complex nested structures well.
+        The table is assembled from the record batches of iter_record_batches,
+        so the intermediate Python column lists only ever hold one batch.
 
         Args:
             messages: List of Message instances to convert
@@ -210,37 +405,41 @@ class Message(BaseModel):
         Returns:
             PyArrow table with messages, with nested objects serialized to JSON strings
         """
-        if not messages:
-            # Return empty table with schema if no messages
-            return pa.Table.from_pylist([], schema=cls.pyarrow_schema())
-
-        # Convert messages to line-delimited JSON format
-        messages_lines = "\n".join([msg.model_dump_json() for msg in messages])
+        return pa.Table.from_batches(
+            cls.iter_record_batches(messages), schema=MESSAGE_SCHEMA
+        )
 
-        # Use PyArrow's JSON reader with explicit schema for consistency
-        # This ensures payload is stored as string (JSON) rather than inferred as struct
-        schema = cls.pyarrow_schema()
-        parse_options = pajson.ParseOptions(explicit_schema=schema)
+    @classmethod
+    def iter_record_batches(
+        cls, messages: list[Self], batch_size: int = 1000
+    ) -> Iterator[pa.RecordBatch]:
+        """Convert Messages to PyArrow record batches of at most batch_size rows.
 
-        # Write to temporary file and read with PyArrow
-        # PyArrow's JSON reader works better with actual files than StringIO
-        with tempfile.NamedTemporaryFile(
-            mode="w", suffix=".json", delete=True
-        ) as tmp_file:
-            tmp_file.write(messages_lines)
-            tmp_file.flush()  # Ensure data is written to disk
+        Only one batch worth of columns is materialized at a time, so consumers
+        that stream batches (e.g. a RecordBatchReader) avoid holding a second
+        full copy of the messages in Arrow memory.
 
-            # Read JSON using PyArrow's JSON reader
-            table = pajson.read_json(tmp_file.name, parse_options=parse_options)
+        Args:
+            messages: List of Message instances to convert
+            batch_size: Maximum number of rows per record batch
 
-        return table
+        Yields:
+            PyArrow record batches with nested objects serialized to JSON strings
+        """
+        for start in range(0, len(messages), batch_size):
+            yield pa.RecordBatch.from_pydict(
+                cls._to_pyarrow_columns(messages[start : start + batch_size]),
+                schema=MESSAGE_SCHEMA,
+            )
 
     @classmethod
     def pyarrow_to_messages(cls, data: pa.Table) -> list[Self]:
         """Create Message instances from a PyArrow table.
 
-        The payload field will be automatically deserialized from JSON strings
-        by the field validator.
+        The table is read one record batch at a time as columns. Top-level
+        fields come from typed Arrow columns and are trusted, so messages are
+        built with from_trusted_dict; only the payload JSON strings are parsed
+        and validated, directly from JSON by pydantic.
 
         Args:
             data: PyArrow table with messages (payload stored as JSON strings)
@@ -248,14 +447,50 @@ class Message(BaseModel):
         Returns:
             List of Message instances with properly deserialized nested objects
         """
-        messages_tbl = data.to_pylist()
-        # The field validator will automatically deserialize JSON strings
-        return [cls.model_validate(msg_dict) for msg_dict in messages_tbl]
+        messages = []
+        for batch in data.to_batches():
+            columns = batch.to_pydict()
+            names = list(columns)
+            for values in zip(*columns.values()):
+                messages.append(cls.from_trusted_dict(dict(zip(names, values))))
+        return messages
+
+    @staticmethod
+    def pyarrow_to_html_bodies(data: pa.Table) -> list[str | None]:
+        """Extract the HTML body of each message in a PyArrow table.
+
+        Only the payload column is read, and payloads are walked as parsed
+        JSON, so no Message models are materialized. Use this instead of
+        pyarrow_to_messages when only the HTML content is needed.
+
+        Args:
+            data: PyArrow table with messages (payload stored as JSON strings)
+
+        Returns:
+            HTML string (or None if there is none) for each row, in order
+        """
+        payloads = data.column("payload")
+        # Only parse payloads whose JSON mentions an HTML part at all; null
+        # payloads match as None, which is skipped like False
+        may_have_html = pc.match_substring(payloads, HTML_MIME_TYPE_JSON).to_pylist()
+        html_bodies: list[str | None] = []
+        for payload, has_html in zip(payloads.to_pylist(), may_have_html):
+            html = None
+            if has_html and payload is not None:
+                # Malformed payloads have no body, as in pyarrow_to_messages
+                try:
+                    html = get_html_from_payload(orjson.loads(payload))
+                except orjson.JSONDecodeError:
+                    pass
+            html_bodies.append(html)
+        return html_bodies
 
 
 class ListMessagesResponse(BaseModel):
     """Response model for Gmail messages list API."""
 
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     messages: list[Message]
     nextPageToken: str | None = None
     resultSizeEstimate: int | None = None
@@ -265,15 +500,24 @@ class FetchConfig(BaseModel):
     """Configuration model for message fetching operations.
 
     Args:
-        messages_per_batch: Number of messages per batch (recommended max 50)
-        response_format: Message format ('metadata', 'full', 'minimal', 'raw')
+        messages_per_batch: Number of messages per batch (recommended max 50,
+            Gmail allows at most 100)
+        response_format: Message format ('metadata', 'full', 'minimal', 'raw').
+            'metadata' responses are around 1 KB instead of the tens of KB of
+            'full' ones, so prefer it when message bodies aren't needed
         metadata_headers: Headers to include when format is 'metadata'
+            (defaults to From, Subject, Date, To and Message-ID)
         max_retry_attempts: Maximum number of retry attempts for failed batches
         initial_retry_delay: Base delay in seconds for exponential backoff
+        use_http2: Fetch each message with its own request multiplexed over
+            HTTP/2 instead of using Gmail batch requests
     """
 
+    model_config = ConfigDict(frozen=True)
+
     messages_per_batch: int = 25
     response_format: Literal["metadata", "full", "minimal", "raw"] = "full"
     metadata_headers: list[str] | None = None
     max_retry_attempts: int = 5
     initial_retry_delay: float = 1.0
+    use_http2: bool = False
@@ -1,8 +1,10 @@
 """Task status storage using DuckDB."""
 
 import logging
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Any
 
 import duckdb
@@ -11,18 +13,74 @@ from gmail_datalake_extractor.config import config
 
 logger = logging.getLogger(__name__)
 
+# Columns update_task can set, in the order they appear in UPDATE statements
+TASK_UPDATE_COLUMNS = (
+    "status",
+    "progress",
+    "message",
+    "message_count",
+    "error",
+    "completed_at",
+)
+
+# Task states after which no further updates are expected
+TERMINAL_TASK_STATUSES = frozenset({"completed", "failed"})
+
+
+_task_db: duckdb.DuckDBPyConnection | None = None
+_task_db_lock = threading.Lock()
+
+# Coalesced task updates not yet written to the database, keyed by task ID
+_pending_updates: dict[str, dict[str, Any]] = {}
+_pending_updates_lock = threading.Lock()
+# Serializes writes of pending updates, so they reach the database in order
+_task_write_lock = threading.Lock()
+
+
+def _get_task_connection() -> duckdb.DuckDBPyConnection:
+    """Get the shared task storage connection, opening it on first use.
+
+    The database file is opened and the task table created once per process
+    instead of on every task read or write.
+    """
+    global _task_db
+
+    with _task_db_lock:
+        if _task_db is None:
+            db_path = config.task.db_path
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+
+            con = duckdb.connect(str(db_path))
+            try:
+                _init_task_table(con)
+            except Exception:
+                con.close()
+                raise
+            _task_db = con
+        return _task_db
+
 
 @contextmanager
 def get_task_db():
-    """Get a DuckDB connection for task storage."""
-    db_path = config.task.db_path
-    db_path.parent.mkdir(parents=True, exist_ok=True)
+    """Get a cursor on the shared DuckDB connection for task storage.
 
-    with duckdb.connect(str(db_path)) as con:
-        _init_task_table(con)
+    Each caller gets its own cursor, so task storage can be used from
+    several threads at once.
+    """
+    with _get_task_connection().cursor() as con:
         yield con
 
 
+def close_task_db() -> None:
+    """Close the shared task storage connection, if it was opened."""
+    global _task_db
+
+    with _task_db_lock:
+        if _task_db is not None:
+            _task_db.close()
+            _task_db = None
+
+
 def _init_task_table(con: duckdb.DuckDBPyConnection) -> None:
     """Initialize the task status table if it doesn't exist."""
     con.execute("""
@@ -51,6 +109,28 @@ def create_task(task_id: str, status: str, progress: int, message: str) -> None:
         )
 
 
+def create_tasks(task_ids: list[str], status: str, progress: int, message: str) -> None:
+    """Create status entries for several tasks in a single transaction."""
+    started_at = datetime.now()
+    with get_task_db() as con:
+        con.begin()
+        try:
+            con.executemany(
+                """
+                INSERT INTO task_status (task_id, status, progress, message, started_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    [task_id, status, progress, message, started_at]
+                    for task_id in task_ids
+                ],
+            )
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+
+
 def update_task(
     task_id: str,
     status: str | None = None,
@@ -60,37 +140,111 @@ def update_task(
     error: str | None = None,
     completed_at: datetime | None = None,
 ) -> None:
-    """Update task status fields."""
-    updates = []
-    params = []
-
-    if status is not None:
-        updates.append("status = ?")
-        params.append(status)
-    if progress is not None:
-        updates.append("progress = ?")
-        params.append(progress)
-    if message is not None:
-        updates.append("message = ?")
-        params.append(message)
-    if message_count is not None:
-        updates.append("message_count = ?")
-        params.append(message_count)
-    if error is not None:
-        updates.append("error = ?")
-        params.append(error)
-    if completed_at is not None:
-        updates.append("completed_at = ?")
-        params.append(completed_at)
-
-    if not updates:
+    """Update task status fields.
+
+    Progress updates are coalesced in memory per task and written by
+    flush_task_updates(), so a long extraction doesn't cost one database
+    transaction per progress report. Updates that move a task to a terminal
+    status are written immediately, together with any pending ones, so
+    callers on an event loop should run those in a worker thread.
+    """
+    fields = {
+        name: value
+        for name, value in (
+            ("status", status),
+            ("progress", progress),
+            ("message", message),
+            ("message_count", message_count),
+            ("error", error),
+            ("completed_at", completed_at),
+        )
+        if value is not None
+    }
+    if not fields:
         return
 
-    params.append(task_id)
-    query = f"UPDATE task_status SET {', '.join(updates)} WHERE task_id = ?"
+    with _pending_updates_lock:
+        _pending_updates.setdefault(task_id, {}).update(fields)
+    if status in TERMINAL_TASK_STATUSES:
+        _write_pending_updates([task_id])
 
-    with get_task_db() as con:
-        con.execute(query, params)
+
+def flush_task_updates() -> int:
+    """Write all pending task updates to the database in one transaction.
+
+    Returns:
+        Number of tasks updated
+    """
+    return _write_pending_updates()
+
+
+def _write_pending_updates(task_ids: list[str] | None = None) -> int:
+    """Write the pending updates of the given tasks (default: all tasks).
+
+    The pending updates lock is not held during the transaction, so updates
+    and reads don't wait for it. Written updates stay pending, and visible to
+    get_task, until they are committed; fields changed in the meantime are
+    kept for the next write.
+
+    Returns:
+        Number of tasks updated
+    """
+    with _task_write_lock:
+        with _pending_updates_lock:
+            if task_ids is None:
+                task_ids = list(_pending_updates)
+            updates = {
+                task_id: dict(_pending_updates[task_id])
+                for task_id in task_ids
+                if task_id in _pending_updates
+            }
+        if not updates:
+            return 0
+
+        with get_task_db() as con:
+            _write_task_updates(con, updates)
+
+        with _pending_updates_lock:
+            for task_id, fields in updates.items():
+                pending = _pending_updates.get(task_id)
+                if pending is None:
+                    continue
+                for name, value in fields.items():
+                    if name in pending and pending[name] == value:
+                        del pending[name]
+                if not pending:
+                    del _pending_updates[task_id]
+    return len(updates)
+
+
+@lru_cache(maxsize=64)
+def _update_task_sql(columns: tuple[str, ...]) -> str:
+    """Build the UPDATE statement setting the given task_status columns."""
+    assignments = ", ".join(f"{name} = ?" for name in columns)
+    return f"UPDATE task_status SET {assignments} WHERE task_id = ?"
+
+
+def _write_task_updates(
+    con: duckdb.DuckDBPyConnection, updates: dict[str, dict[str, Any]]
+) -> None:
+    """Apply the given fields of each task in a single transaction."""
+    # Group tasks by the set of fields they update, so each distinct UPDATE
+    # statement is prepared once and run for all its tasks with executemany
+    params_by_columns: dict[tuple[str, ...], list[list[Any]]] = {}
+    for task_id, fields in updates.items():
+        columns = tuple(name for name in TASK_UPDATE_COLUMNS if name in fields)
+        params_by_columns.setdefault(columns, []).append(
+            [*(fields[name] for name in columns), task_id]
+        )
+
+    con.begin()
+    try:
+        for columns, params in params_by_columns.items():
+            con.executemany(_update_task_sql(columns), params)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
 
 
 def get_task(task_id: str) -> dict[str, Any] | None:
@@ -106,19 +260,51 @@ def get_task(task_id: str) -> dict[str, Any] | None:
             [task_id],
         ).fetchone()
 
-        if not result:
-            return None
-
-        return {
-            "task_id": result[0],
-            "status": result[1],
-            "progress": result[2],
-            "message": result[3],
-            "message_count": result[4],
-            "error": result[5],
-            "started_at": result[6],
-            "completed_at": result[7],
-        }
+    if not result:
+        return None
+
+    task = {
+        "task_id": result[0],
+        "status": result[1],
+        "progress": result[2],
+        "message": result[3],
+        "message_count": result[4],
+        "error": result[5],
+        "started_at": result[6],
+        "completed_at": result[7],
+    }
+    # Overlay progress updates that haven't been flushed yet
+    with _pending_updates_lock:
+        task.update(_pending_updates.get(task_id, {}))
+    return task
+
+
+def fail_interrupted_tasks() -> int:
+    """Mark tasks left unfinished by a previous server process as failed.
+
+    Background tasks run inside the API process, so tasks still started or
+    running at startup were interrupted by a shutdown or crash.
+
+    Returns:
+        Number of tasks marked as failed
+    """
+    with get_task_db() as con:
+        result = con.execute(
+            """
+            UPDATE task_status
+            SET status = 'failed',
+                error = 'Interrupted by server restart',
+                completed_at = ?
+            WHERE status IN ('started', 'running')
+            """,
+            [datetime.now()],
+        ).fetchone()
+        interrupted_count = result[0] if result else 0
+
+    if interrupted_count > 0:
+        logger.warning(f"Marked {interrupted_count} interrupted tasks as failed")
+
+    return interrupted_count
 
 
 def cleanup_old_tasks() -> int:
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from asgi_lifespan import LifespanManager
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+
+from gmail_datalake_extractor.api import app
+from gmail_datalake_extractor.config import config
+from gmail_datalake_extractor.task_storage import close_task_db
+
+LATENCY_FILE = Path(__file__).parent / "_latency.json"
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Record how long each test's call phase took, in nanoseconds."""
+    start = time.perf_counter_ns()
+    yield
+    item.user_properties.append(("ns", time.perf_counter_ns() - start))
+
+
+def pytest_sessionfinish(session):
+    """Write the per-test latencies to _latency.json so runs can be diffed."""
+    latencies = {
+        item.nodeid: value
+        for item in session.items
+        for name, value in item.user_properties
+        if name == "ns"
+    }
+    if latencies:
+        LATENCY_FILE.write_text(json.dumps(latencies, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def task_db_path(tmp_path_factory):
+    """Keep the session's tasks in a temporary database, not ./data/tasks.duckdb."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            config.task, "db_path", tmp_path_factory.mktemp("tasks") / "tasks.duckdb"
+        )
+        yield config.task.db_path
+        close_task_db()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_app():
+    """Build the app's OpenAPI schema and request handling once per session.
+
+    Sends an /extract body that fails validation, which exercises routing,
+    body parsing and validation without creating a task, so the first timed
+    request of a test doesn't pay for any of it.
+    """
+
+    async def post_invalid_extract():
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://test"
+        ) as async_client:
+            return await async_client.post("/extract", json={})
+
+    app.openapi()
+    assert asyncio.run(post_invalid_extract()).status_code == 422
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Test client shared by a test module, so the lifespan runs once per module.
+
+    Only needed for WebSocket tests, which httpx can't drive; HTTP tests use
+    aclient, which has no portal thread between the test and the app.
+
+    Not session-scoped: the lifespan's periodic task flush would otherwise keep
+    running while other modules test buffered task updates.
+    """
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest_asyncio.fixture(scope="session")
+async def aclient():
+    """Async client calling the app in-process, shared by the whole session.
+
+    Tests run on one session-wide event loop, so the app lifespan starts once.
+    Its background loops only run while async tests do, so they don't touch
+    the task store under synchronous tests.
+    """
+    async with LifespanManager(app) as manager:
+        async with AsyncClient(
+            transport=ASGITransport(app=manager.app), base_url="http://test"
+        ) as async_client:
+            yield async_client
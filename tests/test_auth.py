@@ -0,0 +1,187 @@
+import errno
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from google.auth.exceptions import TransportError
+
+from gmail_datalake_extractor import auth
+from gmail_datalake_extractor.config import config
+
+
+class FakeCredentials:
+    def __init__(self, expires_in: timedelta | None):
+        self.expiry = (
+            None
+            if expires_in is None
+            else datetime.now(UTC).replace(tzinfo=None) + expires_in
+        )
+
+
+@pytest.fixture
+def build_calls(monkeypatch):
+    """Stub service building, recording build calls."""
+    calls = []
+    monkeypatch.setattr(auth, "_service_cache", None)
+
+    def fake_build(*args, **kwargs):
+        calls.append(kwargs)
+        return object()
+
+    monkeypatch.setattr(auth, "build", fake_build)
+    return calls
+
+
+def test_get_service_rebuilds_when_credentials_change(build_calls, monkeypatch):
+    first_creds = FakeCredentials(timedelta(hours=1))
+    second_creds = FakeCredentials(timedelta(hours=1))
+    creds = iter([first_creds, first_creds, second_creds, second_creds])
+    monkeypatch.setattr(auth, "get_credentials", lambda: next(creds))
+
+    first = auth.get_service()
+    assert auth.get_service() is first
+    second = auth.get_service()
+    assert auth.get_service() is second
+
+    assert first is not second
+    assert [call["credentials"] for call in build_calls] == [
+        first_creds,
+        second_creds,
+    ]
+    assert all(call["requestBuilder"] is auth.ThreadHttpRequest for call in build_calls)
+    assert all(call["cache_discovery"] is False for call in build_calls)
+    assert all(isinstance(call["model"], auth.OrjsonModel) for call in build_calls)
+
+
+def test_thread_http_is_reused_per_thread_and_credentials():
+    creds = auth.Credentials(token="access-token")
+    http = auth.get_thread_http(creds)
+
+    assert auth.get_thread_http(creds) is http
+    assert auth.get_thread_http(auth.Credentials(token="access-token")) is not http
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(auth.get_thread_http, creds).result() is not http
+
+
+def test_orjson_model_decodes_json_and_passes_through_text():
+    model = auth.OrjsonModel()
+
+    assert model.deserialize(b'{"id": "a", "labelIds": ["INBOX"]}') == {
+        "id": "a",
+        "labelIds": ["INBOX"],
+    }
+    assert model.deserialize(b"not json") == "not json"
+
+
+def write_token(path, expires_in):
+    expiry = datetime.now(UTC) + expires_in
+    path.write_text(
+        json.dumps(
+            {
+                "token": "access-token",
+                "refresh_token": "refresh-token",
+                "client_id": "client-id",
+                "client_secret": "client-secret",
+                "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        )
+    )
+
+
+@pytest.fixture
+def token_path(tmp_path, monkeypatch):
+    """Write a token file holding unexpired credentials and point config at it."""
+    path = tmp_path / "token.json"
+    write_token(path, timedelta(hours=1))
+    monkeypatch.setattr(auth, "_credentials_cache", None)
+    monkeypatch.setattr(config.gmail_api, "token_path", path)
+    return path
+
+
+def test_get_credentials_reuses_creds_until_token_file_changes(token_path):
+    first = auth.get_credentials()
+    assert auth.get_credentials() is first
+
+    mtime_ns = token_path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(token_path, ns=(mtime_ns, mtime_ns))
+
+    assert auth.get_credentials() is not first
+
+
+def test_get_credentials_refreshes_expiring_token_in_background(
+    token_path, monkeypatch
+):
+    write_token(token_path, timedelta(minutes=4, seconds=30))
+
+    def fake_refresh(self, request):
+        self.token = "refreshed-token"
+        self.expiry = datetime.now(UTC).replace(tzinfo=None) + timedelta(hours=1)
+
+    monkeypatch.setattr(auth.Credentials, "refresh", fake_refresh)
+
+    creds = auth.get_credentials()
+    assert auth._refresh_future is not None
+    auth._refresh_future.result(timeout=5)
+
+    assert creds.token == "refreshed-token"
+    assert json.loads(token_path.read_text())["token"] == "refreshed-token"
+    assert auth.get_credentials() is creds
+
+
+def test_save_token_skips_unchanged_credentials(token_path):
+    creds = auth.get_credentials()
+    mtime_ns = auth._save_token(creds, token_path)
+
+    os.utime(token_path, ns=(mtime_ns - 1_000_000_000, mtime_ns - 1_000_000_000))
+    assert auth._save_token(creds, token_path) == mtime_ns - 1_000_000_000
+
+    creds.token = "new-token"
+    auth._save_token(creds, token_path)
+    assert json.loads(token_path.read_text())["token"] == "new-token"
+
+
+def test_save_token_writes_in_place_when_file_cannot_be_replaced(
+    token_path, monkeypatch
+):
+    def fail_replace(src, dst):
+        raise OSError(errno.EBUSY, "Device or resource busy")
+
+    monkeypatch.setattr(auth.os, "replace", fail_replace)
+    creds = auth.get_credentials()
+    creds.token = "new-token"
+
+    assert auth._save_token(creds, token_path) == token_path.stat().st_mtime_ns
+    assert json.loads(token_path.read_text())["token"] == "new-token"
+    assert not list(token_path.parent.glob(".token.json.*.tmp"))
+
+
+def test_refresh_credentials_refreshes_only_the_rejected_token(token_path, monkeypatch):
+    refreshed = []
+
+    def fake_refresh(self, request):
+        refreshed.append(self.token)
+        self.token = "refreshed-token"
+
+    monkeypatch.setattr(auth.Credentials, "refresh", fake_refresh)
+    creds = auth.get_credentials()
+
+    assert auth.refresh_credentials("access-token") is creds
+    assert auth.refresh_credentials("access-token") is creds
+
+    assert refreshed == ["access-token"]
+    assert json.loads(token_path.read_text())["token"] == "refreshed-token"
+    assert auth.get_credentials() is creds
+
+
+def test_get_credentials_lets_transport_errors_propagate(token_path, monkeypatch):
+    write_token(token_path, timedelta(hours=-1))
+
+    def fail_refresh(self, request):
+        raise TransportError("connection reset")
+
+    monkeypatch.setattr(auth.Credentials, "refresh", fail_refresh)
+
+    with pytest.raises(TransportError):
+        auth.get_credentials()
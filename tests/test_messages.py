@@ -0,0 +1,349 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import httplib2
+import httpx
+import orjson
+import pytest
+from googleapiclient.errors import HttpError
+
+from gmail_datalake_extractor import messages as messages_module
+from gmail_datalake_extractor.messages import (
+    DEFAULT_METADATA_HEADERS,
+    MAX_CONCURRENT_BATCHES,
+    MAX_MESSAGES_PER_BATCH,
+    fetch_messages_with_retry,
+    get_message_list,
+    iter_messages_with_retry,
+)
+
+
+class FakeBatch:
+    """Minimal stand-in for googleapiclient's BatchHttpRequest."""
+
+    def __init__(self, service: "FakeGmailService", callback: Any):
+        self.service = service
+        self.callback = callback
+        self.requests: list[tuple[str, dict[str, Any]]] = []
+
+    def add(self, request: dict[str, Any], request_id: str) -> None:
+        self.requests.append((request_id, request))
+
+    def execute(self, http: Any = None) -> None:
+        limit = self.service.inner_request_limit
+        if limit is not None and len(self.requests) > limit:
+            raise HttpError(
+                httplib2.Response({"status": 400}),
+                b'{"error": {"code": 400, "message": "Inner request count exceeds the limit"}}',
+            )
+        with self.service.lock:
+            self.service.batch_sizes.append(len(self.requests))
+            self.service.in_flight += 1
+            self.service.max_in_flight = max(
+                self.service.max_in_flight, self.service.in_flight
+            )
+        time.sleep(self.service.latency)
+        with self.service.lock:
+            self.service.in_flight -= 1
+        for request_id, request in self.requests:
+            failure = self.service.failures.pop(request_id, None)
+            if failure is not None:
+                status, content = (
+                    failure if isinstance(failure, tuple) else (failure, b"")
+                )
+                error = HttpError(httplib2.Response({"status": status}), content)
+                self.callback(request_id, None, error)
+            else:
+                self.callback(request_id, {"id": request["id"], "threadId": "t"}, None)
+
+
+class FakeListRequest:
+    def __init__(self, response: dict[str, Any]):
+        self.response = response
+
+    def execute(self) -> dict[str, Any]:
+        return self.response
+
+
+class FakeMessagesResource:
+    def __init__(self, service: "FakeGmailService"):
+        self.service = service
+
+    def get(self, **kwargs: Any) -> dict[str, Any]:
+        self.service.get_calls.append(kwargs)
+        return kwargs
+
+    def list(self, **kwargs: Any) -> FakeListRequest:
+        return FakeListRequest(self.service.list_response)
+
+
+class FakeUsersResource:
+    def __init__(self, service: "FakeGmailService"):
+        self.service = service
+
+    def messages(self) -> FakeMessagesResource:
+        return FakeMessagesResource(self.service)
+
+
+class FakeGmailService:
+    """Gmail API service double that records batch sizes and concurrency."""
+
+    def __init__(self, latency: float = 0.0, inner_request_limit: int | None = None):
+        self.latency = latency
+        self.inner_request_limit = inner_request_limit
+        # Status codes (or status codes and bodies) to fail the next request
+        # for each message ID with
+        self.failures: dict[str, int | tuple[int, bytes]] = {}
+        self.list_response: dict[str, Any] = {}
+        self.get_calls: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.batch_sizes: list[int] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def users(self) -> FakeUsersResource:
+        return FakeUsersResource(self)
+
+    def new_batch_http_request(self, callback: Any) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture(autouse=True)
+def credentials(monkeypatch):
+    """Stub the credentials that batches and HTTP/2 requests are sent with."""
+    creds = SimpleNamespace(token="x")
+    monkeypatch.setattr(messages_module, "get_credentials", lambda: creds)
+    monkeypatch.setattr(messages_module, "get_thread_http", lambda creds: None)
+    return creds
+
+
+@pytest.fixture
+def gmail_service() -> FakeGmailService:
+    return FakeGmailService()
+
+
+def test_fetch_messages_batches(gmail_service):
+    message_ids = [f"m{i}" for i in range(60)]
+
+    messages = fetch_messages_with_retry(
+        gmail_service, message_ids, messages_per_batch=25
+    )
+
+    assert [msg.id for msg in messages] == message_ids
+    assert gmail_service.batch_sizes == [25, 25, 10]
+
+
+def test_fetch_messages_caps_batch_size(gmail_service):
+    message_ids = [f"m{i}" for i in range(250)]
+
+    messages = fetch_messages_with_retry(
+        gmail_service, message_ids, messages_per_batch=250
+    )
+
+    assert len(messages) == 250
+    assert max(gmail_service.batch_sizes) == MAX_MESSAGES_PER_BATCH
+
+
+def test_fetch_messages_splits_batches_over_inner_request_limit():
+    gmail_service = FakeGmailService(inner_request_limit=20)
+    message_ids = [f"m{i}" for i in range(50)]
+
+    messages = fetch_messages_with_retry(
+        gmail_service, message_ids, messages_per_batch=50
+    )
+
+    assert [msg.id for msg in messages] == message_ids
+    assert gmail_service.batch_sizes == [12, 13, 12, 13]
+
+
+def rate_limit_error(reason: str) -> bytes:
+    """Body of a Gmail HTTP 403 error with the given reason."""
+    return orjson.dumps(
+        {"error": {"code": 403, "errors": [{"reason": reason}], "message": reason}}
+    )
+
+
+def test_fetch_messages_retries_only_retryable_failures(gmail_service):
+    message_ids = [f"m{i}" for i in range(10)]
+    gmail_service.failures = {
+        "m1": 502,
+        "m2": (403, rate_limit_error("userRateLimitExceeded")),
+        "m3": 429,
+        "m4": 504,
+        "m5": 503,
+        "m6": (403, rate_limit_error("forbidden")),
+        "m7": 404,
+    }
+
+    messages = fetch_messages_with_retry(
+        gmail_service,
+        message_ids,
+        messages_per_batch=10,
+        initial_retry_delay=0.0,
+    )
+
+    assert sorted(msg.id for msg in messages) == sorted(
+        msg_id for msg_id in message_ids if msg_id not in ("m6", "m7")
+    )
+    assert gmail_service.batch_sizes == [10, 5]
+
+
+def test_fetch_messages_runs_batches_concurrently():
+    gmail_service = FakeGmailService(latency=0.05)
+    message_ids = [f"m{i}" for i in range(500)]
+
+    messages = fetch_messages_with_retry(
+        gmail_service, message_ids, messages_per_batch=25
+    )
+
+    assert [msg.id for msg in messages] == message_ids
+    assert 1 < gmail_service.max_in_flight <= MAX_CONCURRENT_BATCHES
+
+
+def test_iter_messages_yields_batches_in_order(gmail_service):
+    message_ids = [f"m{i}" for i in range(60)]
+
+    async def collect() -> list[list[str]]:
+        return [
+            [msg.id for msg in batch]
+            async for batch in iter_messages_with_retry(
+                gmail_service, message_ids, messages_per_batch=25
+            )
+        ]
+
+    batches = asyncio.run(collect())
+
+    assert batches == [message_ids[:25], message_ids[25:50], message_ids[50:]]
+
+
+def test_get_message_list_reads_ids_and_tolerates_missing_messages():
+    service = FakeGmailService()
+    service.list_response = {
+        "messages": [{"id": "a", "threadId": "t1"}, {"id": "b", "threadId": "t2"}],
+        "nextPageToken": "next",
+        "resultSizeEstimate": 2,
+    }
+
+    response = get_message_list(service)
+
+    assert [message.id for message in response.messages] == ["a", "b"]
+    assert response.nextPageToken == "next"
+
+    service.list_response = {"resultSizeEstimate": 0}
+    assert get_message_list(service).messages == []
+
+
+def test_fetch_messages_over_http2_retries_only_retryable_failures(monkeypatch):
+    failures = {"m1": 503, "m2": 404}
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        requests.append((message_id, request))
+        status = failures.pop(message_id, None)
+        if status is not None:
+            return httpx.Response(status)
+        return httpx.Response(200, json={"id": message_id, "threadId": "t"})
+
+    monkeypatch.setattr(
+        messages_module,
+        "_new_http2_client",
+        lambda: httpx.AsyncClient(
+            transport=httpx.MockTransport(handler),
+            base_url=messages_module.GMAIL_API_URL,
+        ),
+    )
+    monkeypatch.setattr(
+        messages_module, "get_credentials", lambda: type("Creds", (), {"token": "x"})
+    )
+
+    messages = fetch_messages_with_retry(
+        None,
+        [f"m{i}" for i in range(5)],
+        response_format="metadata",
+        metadata_headers=["From", "Subject"],
+        initial_retry_delay=0,
+        use_http2=True,
+    )
+
+    assert sorted(message.id for message in messages) == ["m0", "m1", "m3", "m4"]
+    assert [message_id for message_id, _ in requests].count("m1") == 2
+    request = requests[0][1]
+    assert request.headers["Authorization"] == "Bearer x"
+    assert request.url.params.get_list("metadataHeaders") == ["From", "Subject"]
+
+
+def test_fetch_messages_over_http2_refreshes_rejected_token(monkeypatch):
+    creds = SimpleNamespace(token="expired")
+    refreshed = []
+    authorizations = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        authorizations.append(request.headers["Authorization"])
+        if request.headers["Authorization"] != "Bearer fresh":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"id": message_id, "threadId": "t"})
+
+    def refresh_credentials(rejected_token):
+        refreshed.append(rejected_token)
+        creds.token = "fresh"
+        return creds
+
+    monkeypatch.setattr(
+        messages_module,
+        "_new_http2_client",
+        lambda: httpx.AsyncClient(
+            transport=httpx.MockTransport(handler),
+            base_url=messages_module.GMAIL_API_URL,
+        ),
+    )
+    monkeypatch.setattr(messages_module, "get_credentials", lambda: creds)
+    monkeypatch.setattr(messages_module, "refresh_credentials", refresh_credentials)
+
+    messages = fetch_messages_with_retry(
+        None, ["m0", "m1"], initial_retry_delay=0, use_http2=True
+    )
+
+    assert sorted(message.id for message in messages) == ["m0", "m1"]
+    assert refreshed == ["expired"]
+    assert authorizations == ["Bearer expired"] * 2 + ["Bearer fresh"] * 2
+
+
+@pytest.mark.parametrize(
+    ("response_format", "metadata_headers"),
+    [("metadata", list(DEFAULT_METADATA_HEADERS)), ("full", None)],
+)
+def test_fetch_messages_only_sends_metadata_headers_for_metadata_format(
+    gmail_service, response_format, metadata_headers
+):
+    fetch_messages_with_retry(
+        gmail_service, ["m0", "m1"], response_format=response_format
+    )
+
+    assert [call.get("metadataHeaders") for call in gmail_service.get_calls] == [
+        metadata_headers,
+        metadata_headers,
+    ]
+    if metadata_headers is None:
+        assert all("metadataHeaders" not in call for call in gmail_service.get_calls)
+
+
+@pytest.mark.parametrize("messages_per_batch", [1, 10, 25, 100])
+def test_fetch_throughput_by_batch_size(record_property, messages_per_batch):
+    message_ids = [f"m{i}" for i in range(200)]
+    service = FakeGmailService(latency=0.01)
+
+    start = time.perf_counter()
+    messages = fetch_messages_with_retry(
+        service, message_ids, messages_per_batch=messages_per_batch
+    )
+    elapsed = time.perf_counter() - start
+
+    assert len(messages) == len(message_ids)
+    assert len(service.batch_sizes) == -(-len(message_ids) // messages_per_batch)
+    # Recorded rather than asserted, so a loaded runner can't fail the test
+    record_property("messages_per_second", round(len(messages) / elapsed))
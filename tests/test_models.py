@@ -0,0 +1,144 @@
+import json
+
+import pyarrow as pa
+
+from gmail_datalake_extractor.models import Message, MessagePart
+
+
+def make_message(message_id: str = "m1") -> Message:
+    return Message.model_validate(
+        {
+            "id": message_id,
+            "threadId": "t1",
+            "labelIds": ["INBOX", "UNREAD"],
+            "snippet": "Hello",
+            "internalDate": "1700000000000",
+            "sizeEstimate": 1234,
+            "payload": {
+                "mimeType": "multipart/alternative",
+                "headers": [{"name": "Subject", "value": "Hi"}],
+                "parts": [
+                    {"mimeType": "text/plain", "body": {"data": "SGVsbG8"}},
+                    {
+                        "mimeType": "text/html",
+                        "body": {"data": "PGI-SGVsbG8_PC9iPg"},
+                    },
+                ],
+            },
+        }
+    )
+
+
+def test_messages_to_pyarrow_table():
+    messages = [make_message("m1"), make_message("m2")]
+
+    table = Message.messages_to_pyarrow_table(messages)
+
+    assert table.schema == Message.pyarrow_schema()
+    assert table.column("id").to_pylist() == ["m1", "m2"]
+    assert table.column("labelIds").to_pylist()[0] == ["INBOX", "UNREAD"]
+    payload = json.loads(table.column("payload")[0].as_py())
+    assert payload["parts"][1]["mimeType"] == "text/html"
+
+
+def test_messages_to_pyarrow_table_empty():
+    table = Message.messages_to_pyarrow_table([])
+
+    assert table.num_rows == 0
+    assert table.schema == Message.pyarrow_schema()
+
+
+def test_iter_record_batches():
+    messages = [make_message(f"m{i}") for i in range(5)]
+
+    batches = list(Message.iter_record_batches(messages, batch_size=2))
+
+    assert [batch.num_rows for batch in batches] == [2, 2, 1]
+    assert all(batch.schema == Message.pyarrow_schema() for batch in batches)
+
+
+def test_pyarrow_round_trip():
+    messages = [make_message("m1"), make_message("m2")]
+
+    restored = Message.pyarrow_to_messages(Message.messages_to_pyarrow_table(messages))
+
+    assert restored == messages
+    assert isinstance(restored[0].payload, MessagePart)
+    assert restored[0].get_html_body() == "<b>Hello?</b>"
+
+
+def test_pyarrow_to_html_bodies():
+    table = Message.messages_to_pyarrow_table(
+        [make_message("m1"), Message(id="m2", threadId="t1"), make_message("m3")]
+    )
+
+    assert Message.pyarrow_to_html_bodies(table) == [
+        "<b>Hello?</b>",
+        None,
+        "<b>Hello?</b>",
+    ]
+
+
+def test_pyarrow_to_html_bodies_skips_malformed_payloads():
+    table = Message.messages_to_pyarrow_table([make_message("m1"), make_message("m2")])
+    payloads = table.column("payload").to_pylist()
+    payloads[1] = '{"mimeType":"text/html","body":'
+    table = table.set_column(
+        table.schema.get_field_index("payload"),
+        "payload",
+        pa.array(payloads, pa.string()),
+    )
+
+    assert Message.pyarrow_to_html_bodies(table) == ["<b>Hello?</b>", None]
+    assert [
+        message.payload is None for message in Message.pyarrow_to_messages(table)
+    ] == [
+        False,
+        True,
+    ]
+
+
+def test_payload_serialized_from_original_json():
+    payload_json = '{"mimeType":"text/html","body":{"data":"PGI-SGk8L2I-"}}'
+    message = Message.model_validate(
+        {"id": "m1", "threadId": "t1", "payload": payload_json}
+    )
+
+    table = Message.messages_to_pyarrow_table([message])
+
+    assert table.column("payload").to_pylist() == [payload_json]
+    # The kept JSON is not a model field, so it doesn't affect equality
+    assert message.payload == MessagePart.model_validate_json(payload_json)
+
+
+def test_has_html_payload():
+    plain = Message.model_validate(
+        {
+            "id": "m2",
+            "threadId": "t1",
+            "payload": {"mimeType": "text/plain", "body": {"data": "SGk"}},
+        }
+    )
+
+    assert make_message().has_html_payload()
+    assert not plain.has_html_payload()
+    assert not Message(id="m3", threadId="t1").has_html_payload()
+
+
+def test_get_header():
+    message = make_message()
+
+    assert message.get_header("Subject") == "Hi"
+    assert message.get_header("subject") == "Hi"
+    assert message.get_header("From") is None
+    assert Message(id="m2", threadId="t1").get_header("Subject") is None
+
+
+def test_from_trusted_dict_matches_model_validate():
+    message = make_message()
+    assert message.payload is not None
+    data = message.model_dump()
+    data["payload"] = message.payload.model_dump_json()
+
+    assert Message.from_trusted_dict(message.model_dump()) == message
+    assert Message.from_trusted_dict(data) == message
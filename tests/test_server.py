@@ -1,37 +1,283 @@
+import asyncio
+import inspect
+import statistics
+import time
+from typing import Any
+from uuid import uuid4
+
+import orjson
 import pytest
-from fastapi.testclient import TestClient
+from fastapi import WebSocketDisconnect
+from fastapi.routing import APIRoute
 
-from gmail_datalake_extractor.api import app
+from gmail_datalake_extractor import api
+from gmail_datalake_extractor.models import FetchConfig, Message
+from gmail_datalake_extractor.task_storage import (
+    TERMINAL_TASK_STATUSES,
+    create_task,
+    update_task,
+)
 
-client = TestClient(app)
+JSON_HEADERS = {"content-type": "application/json"}
 
+EXTRACT_REQUEST = api.ExtractRequest(
+    query="",
+    max_results=10,
+    fetch_config=FetchConfig(messages_per_batch=25, response_format="full"),
+)
+EXTRACT_BODY = EXTRACT_REQUEST.model_dump_json().encode()
+EXTRACT_HEADERS = {**JSON_HEADERS, "content-length": str(len(EXTRACT_BODY))}
 
-def test_health():
-    response = client.get("/health")
-    assert response.status_code == 200
-    assert response.json() == {"status": "healthy"}
+HEALTH_BODY = b'{"status":"healthy"}'
 
 
-def test_extract():
-    response = client.post(
-        "/extract",
-        json={
-            "query": "",
-            "max_results": 10,
-            "fetch_config": {
-                "messages_per_batch": 25,
-                "response_format": "full",
-            },
+async def call_asgi(
+    method: str,
+    path: str,
+    body: bytes = b"",
+    headers: dict[str, str] | None = None,
+    messages: list[dict[str, Any]] | None = None,
+) -> list[dict[str, Any]]:
+    """Dispatch one HTTP request straight to the ASGI app, returning sent messages.
+
+    Sent messages are appended to ``messages`` if it is given, so callers can
+    check what was sent while the app still runs its background tasks.
+    """
+    if messages is None:
+        messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await api.app(
+        {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (name.encode(), value.encode())
+                for name, value in (headers or {}).items()
+            ],
+            "server": ("test", 80),
+            "client": ("test", 0),
         },
+        receive,
+        send,
+    )
+    return messages
+
+
+async def test_health():
+    start, body = await call_asgi("GET", "/health")
+
+    assert start["status"] == 200
+    assert body["body"] == HEALTH_BODY
+
+
+async def test_extract(aclient):
+    response = await aclient.post(
+        "/extract",
+        content=EXTRACT_BODY,
+        headers=EXTRACT_HEADERS,
     )
     assert response.status_code == 200
-    response_data = response.json()
+    response_data = orjson.loads(response.content)
     assert "task_id" in response_data
     assert response_data["status"] == "started"
     assert response_data["message"] == "Extraction task started successfully"
 
 
+async def test_extract_batch(aclient, monkeypatch):
+    started = []
+
+    async def record_extractions(tasks):
+        started.extend(task_id for task_id, _ in tasks)
+
+    monkeypatch.setattr(api, "run_extraction_tasks", record_extractions)
+
+    response = await aclient.post(
+        "/extract/batch",
+        content=api.ExtractBatchRequest(requests=[EXTRACT_REQUEST] * 100)
+        .model_dump_json()
+        .encode(),
+        headers=JSON_HEADERS,
+    )
+
+    assert response.status_code == 200
+    response_data = orjson.loads(response.content)
+    assert len(response_data) == 100
+    assert len({task["task_id"] for task in response_data}) == 100
+    assert all(task["status"] == "started" for task in response_data)
+    assert started == [task["task_id"] for task in response_data]
+
+
+async def test_extract_batch_rejects_oversized_batches(aclient):
+    response = await aclient.post(
+        "/extract/batch",
+        content=orjson.dumps(
+            {"requests": [EXTRACT_REQUEST.model_dump(mode="json")] * 101}
+        ),
+        headers=JSON_HEADERS,
+    )
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("concurrency", [1, 5, 10, 20, 50])
+async def test_extract_throughput(aclient, monkeypatch, record_property, concurrency):
+    async def skip_extraction(task_id, request):
+        pass
+
+    # Measure the endpoint itself, not the extraction it starts
+    monkeypatch.setattr(api, "run_extraction_task", skip_extraction)
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed_extract():
+        async with slots:
+            start = time.perf_counter()
+            response = await aclient.post(
+                "/extract", content=EXTRACT_BODY, headers=EXTRACT_HEADERS
+            )
+            latencies.append(time.perf_counter() - start)
+            return response
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(timed_extract() for _ in range(100)))
+    elapsed = time.perf_counter() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    p50 = statistics.median(latencies)
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    # Recorded rather than asserted, so a loaded runner can't fail the test
+    record_property("requests_per_second", round(len(responses) / elapsed))
+    record_property("p50_ms", round(p50 * 1000, 2))
+    record_property("p95_ms", round(p95 * 1000, 2))
+
+
+async def test_task_status_stream(aclient):
+    task_id = str(uuid4())
+    create_task(task_id=task_id, status="started", progress=0, message="Task started")
+    update_task(task_id=task_id, status="completed", progress=100, message_count=3)
+
+    async with aclient.stream("GET", f"/extract/{task_id}/stream") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [orjson.loads(line) async for line in response.aiter_lines() if line]
+
+    assert [(line["status"], line["message_count"]) for line in lines] == [
+        ("completed", 3)
+    ]
+
+
+async def test_task_status_stream_not_found(aclient):
+    response = await aclient.get(f"/extract/{uuid4()}/stream")
+    assert response.status_code == 404
+
+
+async def test_extract_responds_before_extraction_runs(monkeypatch):
+    extraction_started = asyncio.Event()
+    finish_extraction = asyncio.Event()
+
+    async def blocked_extraction(task_id, request):
+        extraction_started.set()
+        await finish_extraction.wait()
+
+    monkeypatch.setattr(api, "run_extraction_task", blocked_extraction)
+
+    messages = []
+    call = asyncio.create_task(
+        call_asgi("POST", "/extract", EXTRACT_BODY, EXTRACT_HEADERS, messages)
+    )
+    try:
+        await extraction_started.wait()
+        # The task is only enqueued: the whole response is out before it finishes
+        response_start, response_body = messages
+        assert response_start["status"] == 200
+        assert "task_id" in orjson.loads(response_body["body"])
+        assert not call.done()
+    finally:
+        finish_extraction.set()
+    await call
+
+
+async def test_extract_worker_completion(aclient, monkeypatch):
+    saved = []
+
+    async def fake_list_message_ids(service, search_query, max_results):
+        return ["m1", "m2", "m3"]
+
+    async def fake_iter_messages(service, message_ids, fetch_config, chunk_size):
+        yield [Message(id=message_id, threadId="t") for message_id in message_ids]
+
+    monkeypatch.setattr(api, "get_service", lambda: None)
+    monkeypatch.setattr(api, "list_message_ids", fake_list_message_ids)
+    monkeypatch.setattr(api, "iter_messages", fake_iter_messages)
+    monkeypatch.setattr(api, "save_to_datalake", saved.extend)
+
+    response = await aclient.post(
+        "/extract", content=EXTRACT_BODY, headers=EXTRACT_HEADERS
+    )
+    task_id = orjson.loads(response.content)["task_id"]
+
+    status: dict[str, Any] = {}
+    for _ in range(50):
+        status = orjson.loads((await aclient.get(f"/extract/{task_id}/status")).content)
+        if status["status"] in TERMINAL_TASK_STATUSES:
+            break
+        await asyncio.sleep(0.01)
+
+    assert status["status"] == "completed"
+    assert status["message_count"] == 3
+    assert [message.id for message in saved] == ["m1", "m2", "m3"]
+
+
+def test_endpoints_are_async():
+    # Sync endpoints would be run in Starlette's threadpool instead of the event loop
+    routes = {
+        route.path: route for route in api.app.routes if isinstance(route, APIRoute)
+    }
+
+    assert {"/extract", "/extract/batch", "/health"} <= routes.keys()
+    sync_endpoints = [
+        path
+        for path, route in routes.items()
+        if not inspect.iscoroutinefunction(route.endpoint)
+    ]
+    assert sync_endpoints == []
+
+
+def test_task_status_websocket(client):
+    task_id = str(uuid4())
+    create_task(task_id=task_id, status="started", progress=0, message="Task started")
+    update_task(task_id=task_id, status="completed", progress=100, message_count=3)
+
+    with client.websocket_connect(f"/extract/{task_id}/ws") as websocket:
+        frame = websocket.receive_json()
+
+    assert frame["task_id"] == task_id
+    assert frame["status"] == "completed"
+    assert frame["message_count"] == 3
+
+
+def test_task_status_websocket_not_found(client):
+    with client.websocket_connect(f"/extract/{uuid4()}/ws") as websocket:
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+
+    assert exc_info.value.code == 4404
+
+
 if __name__ == "__main__":
     pytest.main(
-        ["-v", __file__],
+        ["-q", "-p", "no:cacheprovider", "--no-header", __file__],
     )
@@ -0,0 +1,122 @@
+from uuid import uuid4
+
+import pytest
+
+from gmail_datalake_extractor import task_storage
+from gmail_datalake_extractor.config import config
+from gmail_datalake_extractor.task_storage import (
+    close_task_db,
+    create_task,
+    fail_interrupted_tasks,
+    flush_task_updates,
+    get_task,
+    get_task_db,
+    update_task,
+)
+
+
+@pytest.fixture(autouse=True)
+def task_db(tmp_path, monkeypatch):
+    """Give each test an empty task database and no pending updates of its own."""
+    close_task_db()
+    monkeypatch.setattr(config.task, "db_path", tmp_path / "tasks.duckdb")
+    monkeypatch.setattr(task_storage, "_pending_updates", {})
+    yield
+    close_task_db()
+
+
+def stored_progress(task_id: str) -> int:
+    """Read a task's progress from the database, bypassing pending updates."""
+    with get_task_db() as con:
+        row = con.execute(
+            "SELECT progress FROM task_status WHERE task_id = ?", [task_id]
+        ).fetchone()
+    assert row is not None
+    return row[0]
+
+
+def test_create_and_update_task():
+    task_id = str(uuid4())
+    create_task(task_id=task_id, status="started", progress=0, message="Task started")
+
+    update_task(task_id=task_id, status="running", progress=10)
+
+    task = get_task(task_id)
+    assert task is not None
+    assert task["status"] == "running"
+    assert task["progress"] == 10
+    assert task["message"] == "Task started"
+
+
+def test_progress_updates_are_buffered_until_flush():
+    task_id = str(uuid4())
+    create_task(task_id=task_id, status="started", progress=0, message="Task started")
+
+    update_task(task_id=task_id, status="running", progress=50)
+
+    assert stored_progress(task_id) == 0
+    task = get_task(task_id)
+    assert task is not None
+    assert task["progress"] == 50
+    assert flush_task_updates() == 1
+    assert stored_progress(task_id) == 50
+
+
+def test_terminal_update_is_written_immediately():
+    task_id = str(uuid4())
+    create_task(task_id=task_id, status="started", progress=0, message="Task started")
+    update_task(task_id=task_id, status="running", progress=50, message="Saving")
+
+    update_task(task_id=task_id, status="completed", progress=100)
+
+    assert stored_progress(task_id) == 100
+    with get_task_db() as con:
+        assert con.execute(
+            "SELECT status, message FROM task_status WHERE task_id = ?", [task_id]
+        ).fetchone() == ("completed", "Saving")
+
+
+def test_updates_made_during_a_flush_are_kept(monkeypatch):
+    task_id = str(uuid4())
+    create_task(task_id=task_id, status="started", progress=0, message="Task started")
+    update_task(task_id=task_id, status="running", progress=50)
+    write_task_updates = task_storage._write_task_updates
+
+    def write_while_updating(con, updates):
+        # Updates don't wait for the flush, and pending ones stay visible
+        update_task(task_id=task_id, progress=60)
+        task = get_task(task_id)
+        assert task is not None
+        assert (task["status"], task["progress"]) == ("running", 60)
+        write_task_updates(con, updates)
+
+    monkeypatch.setattr(task_storage, "_write_task_updates", write_while_updating)
+    assert flush_task_updates() == 1
+    monkeypatch.setattr(task_storage, "_write_task_updates", write_task_updates)
+
+    assert stored_progress(task_id) == 50
+    assert task_storage._pending_updates == {task_id: {"progress": 60}}
+    assert flush_task_updates() == 1
+    assert stored_progress(task_id) == 60
+
+
+def test_get_task_not_found():
+    assert get_task(str(uuid4())) is None
+
+
+def test_fail_interrupted_tasks():
+    running_id, completed_id = str(uuid4()), str(uuid4())
+    create_task(task_id=running_id, status="running", progress=10, message="...")
+    create_task(task_id=completed_id, status="started", progress=0, message="...")
+    update_task(task_id=completed_id, status="completed", progress=100)
+
+    assert fail_interrupted_tasks() == 1
+
+    running = get_task(running_id)
+    assert running is not None
+    assert running["status"] == "failed"
+    assert running["error"] == "Interrupted by server restart"
+    assert running["completed_at"] is not None
+    completed = get_task(completed_id)
+    assert completed is not None
+    assert completed["status"] == "completed"